@@ -0,0 +1,88 @@
+"""Versioned cache key namespaces.
+
+Every cached value belongs to a namespace, and its keys read
+``<namespace>:v<version>:<parts>``. The version is itself stored in the
+cache, so ``bump()`` invalidates the whole namespace at once for every
+worker sharing the cache, without tracking or deleting individual keys.
+"""
+import time
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+
+class CacheNamespace:
+    def __init__(self, name, timeout=DEFAULT_TIMEOUT, alias=DEFAULT_CACHE_ALIAS):
+        self.name = name
+        self.timeout = timeout
+        self.alias = alias
+
+    def __repr__(self):
+        return f'<CacheNamespace {self.name}>'
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def version_key(self):
+        return f'{self.name}:version'
+
+    def version(self):
+        version = self.cache.get(self.version_key)
+        if version is None:
+            # The version key can be culled like any other; restarting from a
+            # fresh value keeps keys of the versions before it from coming back
+            seed = time.time_ns()
+            self.cache.add(self.version_key, seed, None)
+            version = self.cache.get(self.version_key, seed)
+        return version
+
+    def bump(self):
+        """Invalidate every key of the namespace."""
+        try:
+            return self.cache.incr(self.version_key)
+        except ValueError:
+            version = time.time_ns()
+            self.cache.set(self.version_key, version, None)
+            return version
+
+    def key(self, *parts, version=None):
+        """Cache key for ``parts`` at the current (or given) version."""
+        if version is None:
+            version = self.version()
+        return ':'.join([self.name, f'v{version}', *map(str, parts)])
+
+    def keys(self, parts_list):
+        """Keys of many ``parts`` tuples for one version lookup."""
+        version = self.version()
+        return [self.key(*parts, version=version) for parts in parts_list]
+
+    def get(self, *parts):
+        return self.cache.get(self.key(*parts))
+
+    def set(self, value, *parts, timeout=None):
+        self.cache.set(self.key(*parts), value, self.timeout if timeout is None else timeout)
+
+    def get_or_set(self, parts, compute, timeout=None):
+        """Cached value of ``parts``, computing and storing it on a miss."""
+        key = self.key(*parts)
+        value = self.cache.get(key)
+        if value is None:
+            value = compute()
+            self.cache.set(key, value, self.timeout if timeout is None else timeout)
+        return value
+
+    def delete(self, *parts):
+        self.cache.delete(self.key(*parts))
+
+    def incr(self, *parts, delta=1):
+        """Add ``delta`` to a counter of the namespace, creating it if needed."""
+        key = self.key(*parts)
+        if self.cache.add(key, delta, None):
+            return
+        try:
+            self.cache.incr(key, delta)
+        except ValueError:
+            # Evicted between the add and the incr
+            self.cache.set(key, delta, None)
@@ -151,14 +151,52 @@ EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default=EMAIL_HOST_USER)
 
 # Cache configuration
-CACHES = {
-    'default': {
+# CACHE_BACKEND picks where the cache lives:
+#   file   - files under CACHE_LOCATION, shared by every worker on the host (default)
+#   db     - the 'blissbox_cache' table; create it with `manage.py createcachetable`
+#   redis  - the server at CACHE_URL; falls back to file when redis-py isn't installed
+#   locmem - per process only (tests use their own, see blissbox.testing)
+CACHE_BACKEND = config('CACHE_BACKEND', default='file')
+if CACHE_BACKEND == 'redis':
+    try:
+        import redis  # noqa: F401
+    except ImportError:
+        CACHE_BACKEND = 'file'
+
+# Culling limit of the file, db and locmem backends
+CACHE_MAX_ENTRIES = config('CACHE_MAX_ENTRIES', default=10000, cast=int)
+CACHE_BACKENDS = {
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / '.django_cache')),
+        'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'blissbox_cache',
+        'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('CACHE_URL', default='redis://127.0.0.1:6379/1'),
+    },
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'blissbox-cache',
+        'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+    },
+}
+CACHES = {
+    'default': {
+        **CACHE_BACKENDS[CACHE_BACKEND],
         'TIMEOUT': 300,
+        'KEY_PREFIX': 'blissbox',
     }
 }
 
+# Recipe search: FTS5 on SQLite, 'recipes.search.SimpleSearchBackend' elsewhere
+RECIPE_SEARCH_BACKEND = config('RECIPE_SEARCH_BACKEND', default='recipes.search.SQLiteFTSBackend')
+
 # Security
 SECURE_CROSS_ORIGIN_OPENER_POLICY = 'same-origin'
 
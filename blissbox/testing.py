@@ -0,0 +1,29 @@
+"""Helpers shared by the apps' tests."""
+from django.core.cache import cache
+from django.test import override_settings
+
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'blissbox-tests',
+        'KEY_PREFIX': 'blissbox',
+    }
+}
+
+
+def isolated_cache(test_class):
+    """Give a ``TestCase`` a local memory cache of its own, emptied before each test.
+
+    Whatever runs the tests, they never read or clear the shared cache of
+    the configured backend, and cached values never outlive the rolled
+    back rows they were computed from.
+    """
+    test_class = override_settings(CACHES=TEST_CACHES)(test_class)
+    set_up = test_class.setUp
+
+    def setUp(self):
+        cache.clear()
+        set_up(self)
+
+    test_class.setUp = setUp
+    return test_class
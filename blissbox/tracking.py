@@ -0,0 +1,32 @@
+class TracksLoadedValues:
+    """Model mixin remembering field values as last loaded or saved.
+
+    Lets ``save()`` overrides and signal handlers tell which fields really
+    changed without re-reading the row. Put it before ``models.Model`` in
+    the bases so its ``save()`` wraps Django's.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # post_save handlers have seen the old values; start tracking afresh
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+
+    def field_changed(self, attname):
+        """True if ``attname`` differs from its loaded value (or was never loaded)."""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None or attname not in loaded:
+            return True
+        return loaded[attname] != getattr(self, attname)
+
+    def loaded_value(self, attname, default=None):
+        return getattr(self, '_loaded_values', {}).get(attname, default)
@@ -1,5 +1,10 @@
 from django.contrib import admin
-from .models import Cart, CartItem, Order, OrderItem
+from .models import Cart, CartItem, Order, OrderItem, OrderItemExclusion, RecipeSalesRank
+
+class OrderItemExclusionInline(admin.TabularInline):
+    model = OrderItemExclusion
+    extra = 0
+    raw_id_fields = ['recipe_ingredient']
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
@@ -17,6 +22,7 @@ class OrderItemAdmin(admin.ModelAdmin):
     ]
     list_filter = ['order__status']
     search_fields = ['order__order_number', 'recipe__name']
+    inlines = [OrderItemExclusionInline]
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
@@ -27,3 +33,10 @@ class CartAdmin(admin.ModelAdmin):
 class CartItemAdmin(admin.ModelAdmin):
     list_display = ['cart', 'recipe', 'servings', 'quantity', 'customized_price']
     search_fields = ['recipe__name', 'cart__user__username']
+
+@admin.register(RecipeSalesRank)
+class RecipeSalesRankAdmin(admin.ModelAdmin):
+    list_display = ['recipe', 'units_sold', 'units_7d', 'units_30d', 'revenue', 'last_sold_at']
+    ordering = ['-units_sold']
+    search_fields = ['recipe__name']
+    readonly_fields = ['recipe', 'units_sold', 'units_7d', 'units_30d', 'revenue', 'last_sold_at']
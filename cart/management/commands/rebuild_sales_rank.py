@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from cart.sales import rebuild_sales_rank
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the best-selling ranking from order history, creating the rank rows "
+        "of recipes added without signals (bulk_create, loaddata)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--windows',
+            action='store_true',
+            help="Only recompute the 7 and 30 day windows; run daily.",
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = rebuild_sales_rank(windows_only=options['windows'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt sales rank for {count} recipes."))
@@ -0,0 +1,156 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:01
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def csv_to_exclusions(apps, schema_editor):
+    """Convert comma-separated RecipeIngredient ids into exclusion rows."""
+    OrderItem = apps.get_model("cart", "OrderItem")
+    OrderItemExclusion = apps.get_model("cart", "OrderItemExclusion")
+    RecipeIngredient = apps.get_model("recipes", "RecipeIngredient")
+
+    items = OrderItem.objects.exclude(excluded_ingredients="").order_by("pk")
+    last_pk = 0
+    while True:
+        rows = list(
+            items.filter(pk__gt=last_pk).values_list("pk", "excluded_ingredients")[
+                :BATCH_SIZE
+            ]
+        )
+        if not rows:
+            return
+        batch = [
+            (pk, {int(value) for value in csv.split(",") if value.strip().isdigit()})
+            for pk, csv in rows
+        ]
+        _create_exclusions(batch, OrderItemExclusion, RecipeIngredient)
+        last_pk = rows[-1][0]
+
+
+def _create_exclusions(batch, OrderItemExclusion, RecipeIngredient):
+    wanted = set().union(*(ids for _, ids in batch))
+    ingredient_ids = dict(
+        RecipeIngredient.objects.filter(pk__in=wanted).values_list(
+            "pk", "ingredient_id"
+        )
+    )
+    OrderItemExclusion.objects.bulk_create(
+        [
+            OrderItemExclusion(
+                order_item_id=order_item_id,
+                recipe_ingredient_id=recipe_ingredient_id,
+                ingredient_id=ingredient_ids[recipe_ingredient_id],
+            )
+            for order_item_id, ids in batch
+            for recipe_ingredient_id in sorted(ids)
+            # Ids of since deleted recipe ingredients cannot be resolved
+            if recipe_ingredient_id in ingredient_ids
+        ]
+    )
+
+
+def exclusions_to_csv(apps, schema_editor):
+    OrderItem = apps.get_model("cart", "OrderItem")
+    OrderItemExclusion = apps.get_model("cart", "OrderItemExclusion")
+
+    csv_by_item = defaultdict(list)
+    rows = (
+        OrderItemExclusion.objects.exclude(recipe_ingredient=None)
+        .order_by("order_item_id", "recipe_ingredient_id")
+        .values_list("order_item_id", "recipe_ingredient_id")
+    )
+    for order_item_id, recipe_ingredient_id in rows:
+        csv_by_item[order_item_id].append(str(recipe_ingredient_id))
+    items = list(OrderItem.objects.filter(pk__in=list(csv_by_item)))
+    for item in items:
+        item.excluded_ingredients = ",".join(csv_by_item[item.pk])
+    OrderItem.objects.bulk_update(
+        items, ["excluded_ingredients"], batch_size=BATCH_SIZE
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cart", "0002_initial"),
+        ("ingredients", "0001_initial"),
+        ("recipes", "0003_recipe_cost_per_serving"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="order",
+            name="order_number",
+            field=models.CharField(blank=True, max_length=50, unique=True),
+        ),
+        migrations.CreateModel(
+            name="OrderItemExclusion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "ingredient",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="order_exclusions",
+                        to="ingredients.ingredient",
+                    ),
+                ),
+                (
+                    "order_item",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="exclusions",
+                        to="cart.orderitem",
+                    ),
+                ),
+                (
+                    "recipe_ingredient",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="order_exclusions",
+                        to="recipes.recipeingredient",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="orderitemexclusion",
+            index=models.Index(
+                fields=["ingredient", "order_item"],
+                name="cart_orderi_ingredi_4c1338_idx",
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="orderitemexclusion",
+            unique_together={("order_item", "recipe_ingredient")},
+        ),
+        migrations.RunPython(csv_to_exclusions, exclusions_to_csv),
+        migrations.RemoveField(
+            model_name="orderitem",
+            name="excluded_ingredients",
+        ),
+        migrations.AddField(
+            model_name="orderitem",
+            name="excluded_ingredients",
+            field=models.ManyToManyField(
+                blank=True,
+                related_name="excluded_in_order_items",
+                through="cart.OrderItemExclusion",
+                to="recipes.recipeingredient",
+            ),
+        ),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:12
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Max, Q, Sum
+from django.utils import timezone
+
+
+def populate_sales_rank(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    OrderItem = apps.get_model("cart", "OrderItem")
+    RecipeSalesRank = apps.get_model("cart", "RecipeSalesRank")
+    now = timezone.now()
+
+    totals = {
+        row["recipe_id"]: row
+        for row in OrderItem.objects.filter(recipe__isnull=False)
+        .order_by()
+        .values("recipe_id")
+        .annotate(
+            units_sold=Sum("quantity"),
+            revenue=Sum(
+                F("price") * F("quantity"),
+                output_field=models.DecimalField(max_digits=14, decimal_places=2),
+            ),
+            last_sold_at=Max("order__created_at"),
+            units_7d=Sum(
+                "quantity", filter=Q(order__created_at__gte=now - timedelta(days=7))
+            ),
+            units_30d=Sum(
+                "quantity", filter=Q(order__created_at__gte=now - timedelta(days=30))
+            ),
+        )
+    }
+    RecipeSalesRank.objects.bulk_create(
+        [
+            (
+                RecipeSalesRank(
+                    recipe_id=pk,
+                    units_sold=totals[pk]["units_sold"],
+                    revenue=totals[pk]["revenue"],
+                    last_sold_at=totals[pk]["last_sold_at"],
+                    units_7d=totals[pk]["units_7d"] or 0,
+                    units_30d=totals[pk]["units_30d"] or 0,
+                )
+                if pk in totals
+                else RecipeSalesRank(recipe_id=pk)
+            )
+            for pk in Recipe.objects.values_list("pk", flat=True)
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cart", "0003_orderitem_exclusions"),
+        ("recipes", "0005_listing_keyset_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeSalesRank",
+            fields=[
+                (
+                    "recipe",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="sales_rank",
+                        serialize=False,
+                        to="recipes.recipe",
+                    ),
+                ),
+                ("units_sold", models.PositiveIntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=14
+                    ),
+                ),
+                ("units_7d", models.PositiveIntegerField(default=0)),
+                ("units_30d", models.PositiveIntegerField(default=0)),
+                ("last_sold_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["created_at"], name="cart_order_created_650373_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipesalesrank",
+            index=models.Index(
+                fields=["-units_sold", "recipe"], name="cart_recipe_units_s_107015_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipesalesrank",
+            index=models.Index(
+                fields=["-units_30d", "recipe"], name="cart_recipe_units_3_32f16b_idx"
+            ),
+        ),
+        migrations.RunPython(populate_sales_rank, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,17 @@
+from collections import defaultdict, namedtuple
 from django.db import models
+from django.db.models import Count, F, Prefetch, Sum
+from django.utils.functional import cached_property
+from blissbox.tracking import TracksLoadedValues
 from recipes.models import Recipe, RecipeIngredient
+from recipes.pricing import PriceVector
 from decimal import Decimal
 import uuid
 
 
+CartSummary = namedtuple('CartSummary', ['total_price', 'total_items', 'item_count'])
+
+
 class Cart(models.Model):
     user = models.OneToOneField(
         'users.CustomUser',
@@ -15,21 +23,76 @@ class Cart(models.Model):
     
     def __str__(self):
         return f"Cart for {self.user.username}"
+
+    @cached_property
+    def summary(self):
+        """Cart totals from a single aggregate query, memoized on this instance."""
+        totals = self.items.aggregate(
+            total_price=Sum(
+                F('customized_price') * F('quantity'),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2)
+            ),
+            total_items=Sum('quantity'),
+            item_count=Count('id'),
+        )
+        return CartSummary(
+            total_price=(totals['total_price'] or Decimal('0.00')).quantize(Decimal('0.01')),
+            total_items=totals['total_items'] or 0,
+            item_count=totals['item_count'],
+        )
+
+    def get_display_items(self):
+        """Items with their recipe and excluded ingredient names loaded in
+        two queries, however many items the cart holds."""
+        excluded = Prefetch(
+            'excluded_ingredients',
+            queryset=RecipeIngredient.objects.select_related('ingredient').only('id', 'ingredient__name'),
+        )
+        return list(self.items.select_related('recipe').prefetch_related(excluded).order_by('added_at'))
+
+    def refresh_summary(self):
+        """Forget the memoized summary after the cart items changed."""
+        self.__dict__.pop('summary', None)
     
     @property
     def total_price(self):
-        return sum(item.total_price for item in self.items.all())
+        return self.summary.total_price
     
     @property
     def item_count(self):
-        return self.items.count()
+        return self.summary.item_count
     
     @property
     def total_items(self):
-        return sum(item.quantity for item in self.items.all())
+        return self.summary.total_items
+
 
+class CartItemQuerySet(models.QuerySet):
+    def reprice(self):
+        """Re-price every item with a constant number of queries."""
+        # users.dashboard builds on this module
+        from users.dashboard import invalidating_dashboards
 
-class CartItem(models.Model):
+        items = list(self.select_related('recipe', 'cart'))
+        if not items:
+            return 0
+        vectors = PriceVector.for_recipes({item.recipe_id: item.recipe for item in items}.values())
+
+        excluded = defaultdict(set)
+        rows = CartItem.excluded_ingredients.through.objects.filter(
+            cartitem_id__in=[item.pk for item in items]
+        ).values_list('cartitem_id', 'recipeingredient_id')
+        for cartitem_id, recipe_ingredient_id in rows:
+            excluded[cartitem_id].add(recipe_ingredient_id)
+
+        for item in items:
+            item.calculate_customized_price(vectors[item.recipe_id], excluded[item.pk])
+        with invalidating_dashboards({item.cart.user_id for item in items}):
+            CartItem.objects.bulk_update(items, ['customized_price', 'original_price'])
+        return len(items)
+
+
+class CartItem(TracksLoadedValues, models.Model):
     cart = models.ForeignKey(
         Cart,
         on_delete=models.CASCADE,
@@ -60,6 +123,11 @@ class CartItem(models.Model):
     
     added_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CartItemQuerySet.as_manager()
+
+    # Set when exclusions change through the M2M manager (see cart.signals)
+    _exclusions_changed = False
     
     class Meta:
         unique_together = ('cart', 'recipe')
@@ -71,31 +139,44 @@ class CartItem(models.Model):
     def total_price(self):
         return self.customized_price * self.quantity
     
-    def calculate_customized_price(self):
-        """Calculate price based on servings and excluded ingredients"""
+    def calculate_customized_price(self, vector=None, excluded=None):
+        """Calculate price based on servings and excluded ingredients.
+
+        Pass the recipe's ``vector`` and the ``excluded`` RecipeIngredient ids
+        when they are already known to price the item without any query.
+        """
         if not self.recipe:
             self.customized_price = Decimal('0.00')
             return self.customized_price
         
         # Calculate base price as sum of ingredient costs for current servings
-        base_price = self.recipe.get_total_cost_for_servings(self.servings)
+        vector = vector or PriceVector.for_recipe(self.recipe)
+        base_price = vector.total(self.servings)
         
-        # Calculate excluded ingredients cost (only if item is saved and has M2M)
-        excluded_cost = Decimal('0')
-        if self.pk:  # Only access M2M if object is saved
-            try:
-                for excluded_item in self.excluded_ingredients.all():
-                    excluded_cost += excluded_item.get_price_for_servings(self.servings)
-            except Exception:
-                # If M2M access fails, use base price only
-                pass
+        # Price without excluded ingredients (only if item is saved and has M2M)
+        if excluded is None:
+            excluded = ()
+            if self.pk:  # Only access M2M if object is saved
+                excluded = self.excluded_ingredients.order_by().values_list('pk', flat=True)
+        customized = vector.total(self.servings, excluded=excluded)
         
         # Final customized price (minimum 0.01 to avoid zero price issues)
-        self.customized_price = max(base_price - excluded_cost, Decimal('0.01'))
+        self.customized_price = max(customized, Decimal('0.01'))
         # Keep original_price in sync with the full ingredient total for transparency
         self.original_price = base_price
+        self._priced_for = (self.recipe_id, self.servings)
+        self._exclusions_changed = False
         return self.customized_price
 
+    def needs_repricing(self):
+        """True if recipe, servings or exclusions changed since last priced or loaded."""
+        if self._exclusions_changed:
+            return True
+        priced_for = getattr(self, '_priced_for', None)
+        if priced_for is not None:
+            return priced_for != (self.recipe_id, self.servings)
+        return self.field_changed('recipe_id') or self.field_changed('servings')
+
     def save(self, *args, **kwargs):
         """Override save to handle price calculation safely"""
         # Only calculate customized price if we have the necessary data
@@ -109,9 +190,12 @@ class CartItem(models.Model):
                 # Initial save - no M2M yet
                 if not self.customized_price:
                     self.customized_price = self.recipe.base_price
-            else:
+            elif self.needs_repricing():
                 # Update - can safely calculate with M2M
                 self.calculate_customized_price()
+                update_fields = kwargs.get('update_fields')
+                if update_fields is not None:
+                    kwargs['update_fields'] = {*update_fields, 'customized_price', 'original_price'}
         
         super().save(*args, **kwargs)
 
@@ -153,6 +237,9 @@ class Order(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.order_number:
@@ -186,8 +273,88 @@ class OrderItem(models.Model):
     
     servings = models.PositiveIntegerField()
     quantity = models.PositiveIntegerField(default=1)
-    excluded_ingredients = models.TextField(blank=True)  # Store as comma-separated IDs
+    excluded_ingredients = models.ManyToManyField(
+        RecipeIngredient,
+        through='OrderItemExclusion',
+        blank=True,
+        related_name='excluded_in_order_items'
+    )
     price = models.DecimalField(max_digits=10, decimal_places=2)
     
     def __str__(self):
         return f"{self.recipe.name} - Order {self.order.order_number}"
+
+
+class OrderItemExclusionQuerySet(models.QuerySet):
+    def frequency_by_ingredient(self):
+        """How often each ingredient was excluded, most excluded first.
+
+        Chain after filters, e.g. ``.filter(order_item__recipe=recipe)``.
+        """
+        return (
+            self.order_by()
+            .values('ingredient_id', 'ingredient__name')
+            .annotate(times_excluded=Count('id'))
+            .order_by('-times_excluded', 'ingredient__name')
+        )
+
+
+class OrderItemExclusion(models.Model):
+    """One ingredient left out of an ordered recipe."""
+    order_item = models.ForeignKey(
+        OrderItem,
+        on_delete=models.CASCADE,
+        related_name='exclusions'
+    )
+    recipe_ingredient = models.ForeignKey(
+        RecipeIngredient,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='order_exclusions'
+    )
+    # Kept alongside recipe_ingredient so reporting survives recipe edits
+    ingredient = models.ForeignKey(
+        'ingredients.Ingredient',
+        on_delete=models.PROTECT,
+        related_name='order_exclusions'
+    )
+
+    objects = OrderItemExclusionQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('order_item', 'recipe_ingredient')
+        indexes = [
+            models.Index(fields=['ingredient', 'order_item']),
+        ]
+
+    def __str__(self):
+        return f"{self.order_item} without {self.ingredient}"
+
+
+class RecipeSalesRank(models.Model):
+    """Running sales totals of one recipe, the key of the best-selling sort.
+
+    Kept up to date by ``cart.sales.record_sales`` as orders are placed.
+    The 7 and 30 day windows only ever grow between rebuilds, so
+    ``rebuild_sales_rank --windows`` should run daily to age old sales out.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='sales_rank'
+    )
+    units_sold = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    units_7d = models.PositiveIntegerField(default=0)
+    units_30d = models.PositiveIntegerField(default=0)
+    last_sold_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-units_sold', 'recipe']),
+            models.Index(fields=['-units_30d', 'recipe']),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe} - {self.units_sold} sold"
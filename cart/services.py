@@ -0,0 +1,178 @@
+"""Cart mutations with a bounded number of queries.
+
+Exclusions are validated with one filtered query and written as a delta
+on the ``CartItem.excluded_ingredients`` through table, and items are
+priced from a ``PriceVector`` without re-reading the M2M.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+
+from recipes.models import RecipeIngredient
+from recipes.pricing import PriceVector
+from users.dashboard import invalidating_dashboards
+from .models import CartItem, Order, OrderItem, OrderItemExclusion
+from .sales import record_sales
+
+ExclusionThrough = CartItem.excluded_ingredients.through
+
+
+def valid_exclusions(recipe_id, recipe_ingredient_ids):
+    """The subset of ``recipe_ingredient_ids`` belonging to the recipe."""
+    if not recipe_ingredient_ids:
+        return set()
+    return set(
+        RecipeIngredient.objects
+        .filter(recipe_id=recipe_id, id__in=recipe_ingredient_ids)
+        .order_by()
+        .values_list('id', flat=True)
+    )
+
+
+def current_exclusions(item):
+    return set(
+        ExclusionThrough.objects
+        .filter(cartitem_id=item.pk)
+        .values_list('recipeingredient_id', flat=True)
+    )
+
+
+def apply_exclusions(item, wanted, current=None):
+    """Write the difference between ``wanted`` and the ``current`` exclusions
+    (read if not given) with at most one delete and one bulk insert."""
+    if current is None:
+        current = current_exclusions(item)
+
+    removed = current - wanted
+    if removed:
+        ExclusionThrough.objects.filter(cartitem_id=item.pk, recipeingredient_id__in=removed).delete()
+    added = wanted - current
+    if added:
+        ExclusionThrough.objects.bulk_create([
+            ExclusionThrough(cartitem_id=item.pk, recipeingredient_id=recipe_ingredient_id)
+            for recipe_ingredient_id in added
+        ])
+
+
+def set_exclusions(item, recipe_ingredient_ids):
+    """Make the item's exclusions exactly the valid ids among ``recipe_ingredient_ids``.
+
+    Returns the resulting set of excluded RecipeIngredient ids.
+    """
+    wanted = valid_exclusions(item.recipe_id, recipe_ingredient_ids)
+    apply_exclusions(item, wanted)
+    return wanted
+
+
+def add_to_cart(cart, recipe, servings, quantity, excluded_ids, vector=None):
+    """Add ``recipe`` to the cart, or bump it if already there.
+
+    The posted exclusions replace the item's current ones. Returns
+    ``(item, created, excluded)``.
+    """
+    vector = vector or PriceVector.for_recipe(recipe)
+    with invalidating_dashboards([cart.user_id]), transaction.atomic():
+        excluded = valid_exclusions(recipe.pk, excluded_ids)
+        item = CartItem(cart=cart, recipe=recipe, servings=servings, quantity=quantity)
+        item.calculate_customized_price(vector, excluded)
+        item, created = CartItem.objects.get_or_create(
+            cart=cart,
+            recipe=recipe,
+            defaults={
+                'servings': servings,
+                'quantity': quantity,
+                'original_price': item.original_price,
+                'customized_price': item.customized_price,
+            }
+        )
+
+        if created:
+            apply_exclusions(item, excluded, current=set())
+        else:
+            item.quantity += quantity
+            item.servings = servings
+            apply_exclusions(item, excluded)
+            item.calculate_customized_price(vector, excluded)
+            item.save(update_fields=['quantity', 'servings', 'customized_price', 'original_price', 'updated_at'])
+    cart.refresh_summary()
+    return item, created, excluded
+
+
+def update_cart_item(item, quantity, servings, excluded_ids=None, vector=None):
+    """Update quantity and servings; replace exclusions unless ``excluded_ids`` is None.
+
+    The item is only re-priced when servings or exclusions are touched.
+    Returns the set of excluded ids, or None when exclusions were left alone.
+    """
+    fields = ['quantity', 'updated_at']
+    item.quantity = quantity
+    excluded = None
+    with transaction.atomic():
+        if excluded_ids is not None:
+            excluded = set_exclusions(item, excluded_ids)
+        if excluded is not None or servings != item.servings:
+            item.servings = servings
+            item.calculate_customized_price(
+                vector,
+                excluded if excluded is not None else current_exclusions(item),
+            )
+            fields += ['servings', 'customized_price', 'original_price']
+        # Already priced above, so this is a single UPDATE
+        item.save(update_fields=fields)
+    return excluded
+
+
+def place_order(cart, tax=Decimal('0.00'), shipping=Decimal('0.00'), **order_fields):
+    """Turn the cart into an Order inside one short transaction.
+
+    Cart items and all their exclusions are read with two queries, order
+    items and their exclusions are written with one bulk_create each, the
+    sales ranking is bumped with two statements and the cart is emptied
+    with one delete, so the write lock is held for a constant number of
+    statements. The subtotal is taken from the items read here.
+    """
+    with invalidating_dashboards([cart.user_id]), transaction.atomic():
+        items = list(cart.items.order_by('added_at'))
+        excluded = defaultdict(list)
+        rows = (
+            ExclusionThrough.objects
+            .filter(cartitem_id__in=[item.pk for item in items])
+            .order_by('recipeingredient_id')
+            .values_list('cartitem_id', 'recipeingredient_id', 'recipeingredient__ingredient_id')
+        )
+        for cartitem_id, recipe_ingredient_id, ingredient_id in rows:
+            excluded[cartitem_id].append((recipe_ingredient_id, ingredient_id))
+
+        subtotal = sum((item.total_price for item in items), Decimal('0.00'))
+        order = Order.objects.create(
+            user_id=cart.user_id,
+            subtotal=subtotal,
+            tax=tax,
+            shipping=shipping,
+            total=subtotal + tax + shipping,
+            **order_fields
+        )
+        order_items = OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                recipe_id=item.recipe_id,
+                servings=item.servings,
+                quantity=item.quantity,
+                price=item.customized_price,
+            )
+            for item in items
+        ])
+        OrderItemExclusion.objects.bulk_create([
+            OrderItemExclusion(
+                order_item=order_item,
+                recipe_ingredient_id=recipe_ingredient_id,
+                ingredient_id=ingredient_id,
+            )
+            for item, order_item in zip(items, order_items)
+            for recipe_ingredient_id, ingredient_id in excluded[item.pk]
+        ])
+        record_sales(order_items, sold_at=order.created_at)
+        CartItem.objects.filter(cart=cart).delete()
+    cart.refresh_summary()
+    return order
@@ -0,0 +1,36 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.models import Recipe
+from users.dashboard import cart_owner, in_dashboard_batch, invalidate_dashboard
+from .models import CartItem, Order
+from .sales import ensure_ranks
+
+
+@receiver(m2m_changed, sender=CartItem.excluded_ingredients.through)
+def cart_item_exclusions_changed(sender, instance, action, reverse, **kwargs):
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        instance._exclusions_changed = True
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, raw=False, **kwargs):
+    # Every recipe has a rank row, so the best-selling sort can inner join
+    if created and not raw:
+        ensure_ranks([instance.pk])
+
+
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def cart_item_changed(sender, instance, raw=False, **kwargs):
+    # Cart counters on the user's dashboard; bulk writers batch this
+    if not raw and not in_dashboard_batch():
+        invalidate_dashboard(cart_owner(instance))
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def order_changed(sender, instance, raw=False, **kwargs):
+    # Order counts and the latest orders on the user's dashboard
+    if not raw:
+        invalidate_dashboard(instance.user_id)
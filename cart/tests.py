@@ -1,3 +1,105 @@
+from decimal import Decimal
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from blissbox.testing import isolated_cache
+from ingredients.models import Ingredient
+from recipes.models import Recipe, RecipeIngredient
+from users.models import CustomUser
+from .models import Cart, CartItem
+from .sales import rebuild_sales_rank
+
+# Queries allowed for rendering the cart page, whatever the cart size
+CART_PAGE_QUERY_BUDGET = 8
+
+
+@isolated_cache
+class CartPageQueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('baker', 'baker@example.com', 'secret-pass-123')
+        cls.cart = Cart.objects.create(user=cls.user)
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'Ingredient {i}', base_price_per_unit=Decimal('1.50'))
+            for i in range(4)
+        ]
+
+    def add_items(self, count):
+        for i in range(count):
+            recipe = Recipe.objects.create(
+                name=f'Cake {CartItem.objects.count()}-{i}',
+                description='Cake',
+                instructions='Bake',
+                base_price=Decimal('100.00'),
+                is_published=True,
+            )
+            lines = [
+                RecipeIngredient.objects.create(recipe=recipe, ingredient=ingredient, quantity=Decimal('10'))
+                for ingredient in self.ingredients
+            ]
+            item = CartItem.objects.create(
+                cart=self.cart,
+                recipe=recipe,
+                original_price=Decimal('60.00'),
+                customized_price=Decimal('60.00'),
+            )
+            item.excluded_ingredients.add(*lines[:2])
+
+    def render_cart(self, url_name):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_cart_page_query_count_does_not_grow_with_cart_size(self):
+        self.client.force_login(self.user)
+
+        self.add_items(1)
+        _, small = self.render_cart('cart:view')
+        self.add_items(9)
+        response, large = self.render_cart('cart:view')
+
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, CART_PAGE_QUERY_BUDGET)
+        self.assertContains(response, 'Ingredient 0, Ingredient 1')
+
+    def test_checkout_page_query_count_does_not_grow_with_cart_size(self):
+        self.client.force_login(self.user)
+
+        self.add_items(1)
+        _, small = self.render_cart('cart:checkout')
+        self.add_items(9)
+        _, large = self.render_cart('cart:checkout')
+
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, CART_PAGE_QUERY_BUDGET)
+
+
+@isolated_cache
+class BestSellingListingTests(TestCase):
+    def best_selling(self):
+        response = self.client.get(reverse('recipes:products'), {'sort': 'best_selling'})
+        return {product.pk for product in response.context['products']}
+
+    def new_recipe(self, name):
+        return Recipe(
+            name=name,
+            slug=name.lower(),
+            description='Cake',
+            instructions='Bake',
+            base_price=Decimal('100.00'),
+            is_published=True,
+        )
+
+    def test_every_recipe_is_ranked(self):
+        created = self.new_recipe('Created')
+        created.save()
+        bulk = Recipe.objects.bulk_create([self.new_recipe('Bulk')])[0]
+        self.assertEqual(self.best_selling(), {created.pk})
 
-# Create your tests here.
+        # The daily windows rebuild creates the rows signals never did
+        rebuild_sales_rank(windows_only=True)
+        self.assertEqual(self.best_selling(), {created.pk, bulk.pk})
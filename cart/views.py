@@ -1,12 +1,12 @@
 from django.views.generic import View, TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import redirect, get_object_or_404, render
-from django.http import JsonResponse
 from django.contrib import messages
-from django.db import transaction
 from decimal import Decimal
-from .models import Cart, CartItem, Order
-from recipes.models import Recipe, RecipeIngredient
+from .models import Cart, CartItem
+from .services import add_to_cart, place_order, update_cart_item
+from recipes.models import Recipe
+from recipes.pricing import PriceVector, price_version
 
 
 class CartView(LoginRequiredMixin, TemplateView):
@@ -17,6 +17,7 @@ class CartView(LoginRequiredMixin, TemplateView):
         # Create cart if it doesn't exist
         cart, created = Cart.objects.get_or_create(user=self.request.user)
         context['cart'] = cart
+        context['cart_items'] = cart.get_display_items()
         return context
 
 
@@ -31,53 +32,21 @@ class AddToCartView(LoginRequiredMixin, View):
         # Get and clean excluded ingredients - FILTER OUT EMPTY STRINGS
         excluded_ingredient_ids_raw = request.POST.getlist('excluded_ingredients')
         excluded_ingredient_ids = [int(val) for val in excluded_ingredient_ids_raw if val.isdigit()]
+
+        # Reject quotes priced from a stale price matrix (see recipes.pricing)
+        vector = PriceVector.for_recipe(recipe)
+        quoted_version = request.POST.get('price_version')
+        if quoted_version and quoted_version != price_version(vector):
+            messages.warning(request, f'Prices for {recipe.name} have changed. Please review the updated price.')
+            return redirect('recipes:detail', slug=recipe.slug)
         
         try:
-            with transaction.atomic():
-                # Step 1: Create or get CartItem WITHOUT M2M fields in defaults
-                item, created = CartItem.objects.get_or_create(
-                    cart=cart,
-                    recipe=recipe,
-                    defaults={
-                        'servings': servings,
-                        'quantity': quantity,
-                        'original_price': recipe.base_price,
-                        'customized_price': recipe.base_price  # Initial value
-                    }
-                )
-                
-                if not created:
-                    # For existing items, update basic fields first
-                    item.quantity += quantity
-                    item.servings = servings
-                    # Save basic fields before M2M operations
-                    item.save(update_fields=['quantity', 'servings'])
-                
-                # Step 2: Handle excluded ingredients consistently (after item has an ID)
-                # Always clear existing exclusions so unchecking boxes is respected
-                if not item.pk:
-                    item.save()
-                item.excluded_ingredients.clear()
+            item, created, excluded = add_to_cart(
+                cart, recipe, servings, quantity, excluded_ingredient_ids, vector=vector
+            )
 
-                # Add new exclusions if any (only valid numeric IDs)
-                added_count = 0
-                for ingredient_id in excluded_ingredient_ids:
-                    try:
-                        recipe_ingredient = RecipeIngredient.objects.get(id=ingredient_id)
-                        # Verify it belongs to this recipe
-                        if recipe_ingredient.recipe == recipe:
-                            item.excluded_ingredients.add(recipe_ingredient)
-                            added_count += 1
-                    except RecipeIngredient.DoesNotExist:
-                        # Ignore invalid ingredient IDs
-                        continue
-
-                if added_count > 0:
-                    messages.info(request, f'{added_count} ingredients excluded from {recipe.name}.')
-                
-                # Step 3: Recalculate price after exclusions (now safe after M2M)
-                item.calculate_customized_price()
-                item.save(update_fields=['customized_price', 'original_price'])
+            if excluded:
+                messages.info(request, f'{len(excluded)} ingredients excluded from {recipe.name}.')
             
             # Success messages
             if created:
@@ -95,7 +64,9 @@ class AddToCartView(LoginRequiredMixin, View):
 class RemoveFromCartView(LoginRequiredMixin, View):
     def post(self, request, item_id):
         try:
-            item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
+            item = get_object_or_404(
+                CartItem.objects.select_related('recipe', 'cart'), id=item_id, cart__user=request.user
+            )
             recipe_name = item.recipe.name
             item.delete()
             messages.success(request, f'{recipe_name} removed from cart.')
@@ -108,44 +79,30 @@ class RemoveFromCartView(LoginRequiredMixin, View):
 class UpdateCartItemView(LoginRequiredMixin, View):
     def post(self, request, item_id):
         try:
-            item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
+            item = get_object_or_404(
+                CartItem.objects.select_related('recipe', 'cart'), id=item_id, cart__user=request.user
+            )
             quantity = int(request.POST.get('quantity', item.quantity))
             servings = int(request.POST.get('servings', item.servings))
             
-            # Get and clean excluded ingredients
-            excluded_ingredient_ids_raw = request.POST.getlist('excluded_ingredients')
-            excluded_ingredient_ids = [int(val) for val in excluded_ingredient_ids_raw if val.isdigit()]
-            
-            # Update basic fields first
-            item.quantity = quantity
-            item.servings = servings
-            item.save(update_fields=['quantity', 'servings'])
-            
-            # Handle excluded ingredients: always clear, then re-add any provided
-            item.excluded_ingredients.clear()
-            added_count = 0
-            for ingredient_id in excluded_ingredient_ids:
-                try:
-                    recipe_ingredient = RecipeIngredient.objects.get(id=ingredient_id)
-                    if recipe_ingredient.recipe == item.recipe:
-                        item.excluded_ingredients.add(recipe_ingredient)
-                        added_count += 1
-                except RecipeIngredient.DoesNotExist:
-                    continue
-
-            if added_count > 0:
-                messages.info(request, f'Updated {added_count} exclusions for {item.recipe.name}.')
-            
-            # Recalculate price
-            item.calculate_customized_price()
-            item.save(update_fields=['customized_price', 'original_price'])
-            
-            if quantity > 0:
-                messages.info(request, f'{item.recipe.name} updated.')
-            else:
+            if quantity <= 0:
                 recipe_name = item.recipe.name
                 item.delete()
                 messages.success(request, f'{recipe_name} removed from cart.')
+                return redirect('cart:view')
+
+            # Exclusions are only replaced when the field is posted; send an
+            # empty excluded_ingredients value to clear them all
+            excluded_ingredient_ids = None
+            if 'excluded_ingredients' in request.POST:
+                excluded_ingredient_ids_raw = request.POST.getlist('excluded_ingredients')
+                excluded_ingredient_ids = [int(val) for val in excluded_ingredient_ids_raw if val.isdigit()]
+            
+            excluded = update_cart_item(item, quantity, servings, excluded_ingredient_ids)
+
+            if excluded:
+                messages.info(request, f'Updated {len(excluded)} exclusions for {item.recipe.name}.')
+            messages.info(request, f'{item.recipe.name} updated.')
                 
         except Exception as e:
             messages.error(request, f'Error updating cart: {str(e)}')
@@ -156,7 +113,8 @@ class UpdateCartItemView(LoginRequiredMixin, View):
 class CheckoutView(LoginRequiredMixin, View):
     def get(self, request):
         cart, created = Cart.objects.get_or_create(user=request.user)
-        if cart.items.count() == 0:
+        summary = cart.summary
+        if summary.item_count == 0:
             messages.warning(request, 'Your cart is empty.')
             return redirect('cart:view')
         
@@ -165,15 +123,16 @@ class CheckoutView(LoginRequiredMixin, View):
         from django.shortcuts import render
         return render(request, 'cart/checkout.html', {
             'cart': cart,
-            'subtotal': cart.total_price,
+            'cart_items': cart.get_display_items(),
+            'subtotal': summary.total_price,
             'shipping': Decimal('50.00'),
             'tax': Decimal('0.00'),
-            'total': cart.total_price + Decimal('50.00')
+            'total': summary.total_price + Decimal('50.00')
         })
     
     def post(self, request):
         cart, _ = Cart.objects.get_or_create(user=request.user)
-        if cart.items.count() == 0:
+        if cart.summary.item_count == 0:
             messages.warning(request, 'Your cart is empty.')
             return redirect('cart:view')
         
@@ -197,41 +156,17 @@ class CheckoutView(LoginRequiredMixin, View):
                 messages.error(request, 'Invalid delivery date format. Use YYYY-MM-DD.')
                 return redirect('cart:checkout')
         
-        # Calculate totals
-        subtotal = cart.total_price
-        tax = Decimal('0.00')  # TODO: Calculate tax
-        shipping = Decimal('50.00')  # TODO: Calculate shipping
-        total = subtotal + tax + shipping
-        
         try:
-            with transaction.atomic():
-                # Create order
-                order = Order.objects.create(
-                    user=request.user,
-                    subtotal=subtotal,
-                    tax=tax,
-                    shipping=shipping,
-                    total=total,
-                    delivery_address=delivery_address,
-                    delivery_date=delivery_date
-                )
-                
-                # Create order items
-                for cart_item in cart.items.all():
-                    OrderItem.objects.create(
-                        order=order,
-                        recipe=cart_item.recipe,
-                        servings=cart_item.servings,
-                        quantity=cart_item.quantity,
-                        excluded_ingredients=','.join([str(ri.id) for ri in cart_item.excluded_ingredients.all()]),
-                        price=cart_item.customized_price
-                    )
-                
-                # Clear cart
-                cart.items.all().delete()
+            order = place_order(
+                cart,
+                tax=Decimal('0.00'),  # TODO: Calculate tax
+                shipping=Decimal('50.00'),  # TODO: Calculate shipping
+                delivery_address=delivery_address,
+                delivery_date=delivery_date
+            )
                 
-            messages.success(request, f'Order #{order.order_number} created successfully! Total: ₹{total}')
-            return redirect('users:order_history')
+            messages.success(request, f'Order #{order.order_number} created successfully! Total: ₹{order.total}')
+            return redirect('users:orders')
             
         except Exception as e:
             messages.error(request, f'Error creating order: {str(e)}')
@@ -1,8 +1,9 @@
 from django.db import models
 from django.core.validators import MinValueValidator
 from decimal import Decimal
+from blissbox.tracking import TracksLoadedValues
 
-class Ingredient(models.Model):
+class Ingredient(TracksLoadedValues, models.Model):
     UNIT_CHOICES = [
         ('g', 'Grams'),
         ('kg', 'Kilograms'),
@@ -7,12 +7,14 @@ from django.http import JsonResponse
 from django.shortcuts import render
 from django.views.decorators.csrf import csrf_exempt
 from django.urls import reverse
-from cart.models import Cart, Order, OrderItem
+from cart.models import Cart
+from cart.services import place_order
 
 @login_required
 def checkout(request):
     cart = Cart.objects.get(user=request.user)
-    amount = int(cart.total_price * 100)
+    total = cart.summary.total_price
+    amount = int(total * 100)
     client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
 
     payment = client.order.create({
@@ -24,7 +26,7 @@ def checkout(request):
     return render(request, "payments/checkout.html", {
         "payment": payment,
         "key": settings.RAZORPAY_KEY_ID,
-        "total": cart.total_price,
+        "total": total,
     })
 
 @csrf_exempt
@@ -54,30 +56,13 @@ def verify_payment(request):
 
     try:
         cart = Cart.objects.get(user=request.user)
-        subtotal = Decimal(cart.total_price)
-        tax = Decimal("0.00")
-        shipping = Decimal("0.00")
-
-        order = Order.objects.create(
-            user=request.user,
-            subtotal=subtotal,
-            tax=tax,
-            shipping=shipping,
+        place_order(
+            cart,
+            tax=Decimal("0.00"),
+            shipping=Decimal("0.00"),
             delivery_address="Not provided",
             status="confirmed",
         )
-
-        for cart_item in cart.items.all():
-            OrderItem.objects.create(
-                order=order,
-                recipe=cart_item.recipe,
-                servings=cart_item.servings,
-                quantity=cart_item.quantity,
-                excluded_ingredients=','.join([str(ri.id) for ri in cart_item.excluded_ingredients.all()]),
-                price=cart_item.customized_price,
-            )
-
-        cart.items.all().delete()
     except Exception:
         return JsonResponse({"success": False, "error": "Order creation failed"}, status=500)
 
@@ -0,0 +1,114 @@
+"""Dietary tags as a bitmask.
+
+Every ``DietaryTag`` choice owns one bit of ``Recipe.dietary_mask``, which
+``recipes.signals`` keeps in sync with the ``dietary_tags`` m2m. "Vegan and
+gluten free" is then a predicate on one column instead of a join per tag.
+A recipe carries every tag of a mask when its own mask is a superset of
+it; with only a handful of tags the superset masks are enumerated and
+matched with an ``IN`` on the indexed column, which the index can serve
+where a bitwise expression could not.
+"""
+from .models import DietaryTag, Recipe
+
+# Bits follow the order of the choices: only ever append new ones
+DIETARY_BITS = {name: 1 << i for i, (name, label) in enumerate(DietaryTag.DIETARY_CHOICES)}
+ALL_TAGS_MASK = sum(DIETARY_BITS.values())
+
+
+def mask_of(names):
+    mask = 0
+    for name in names:
+        mask |= DIETARY_BITS.get(name, 0)
+    return mask
+
+
+def tags_of(mask):
+    return [name for name, bit in DIETARY_BITS.items() if mask & bit]
+
+
+def superset_masks(mask):
+    """Every mask carrying all the tags of ``mask``."""
+    return [value for value in range(ALL_TAGS_MASK + 1) if value & mask == mask]
+
+
+def matching(qs, mask):
+    """Recipes of ``qs`` carrying every tag of ``mask``."""
+    if not mask:
+        return qs
+    return qs.filter(dietary_mask__in=superset_masks(mask))
+
+
+def user_dietary_mask(user):
+    """Mask of the restrictions in ``user``'s profile: one query."""
+    if not user.is_authenticated:
+        return 0
+    return mask_of(DietaryTag.objects.filter(users_with_restriction__user=user).values_list('name', flat=True))
+
+
+def refresh_dietary_masks(recipe_ids=None, batch_size=500):
+    """Recompute ``Recipe.dietary_mask`` from the m2m for ``recipe_ids`` (all if None).
+
+    Each batch costs a select, one query for its tags and one bulk UPDATE of
+    the masks that changed; returns the number of recipes updated.
+    """
+    recipes = Recipe.objects.order_by('pk').only('pk', 'dietary_mask')
+    if recipe_ids is not None:
+        recipe_ids = set(recipe_ids)
+        if not recipe_ids:
+            return 0
+        recipes = recipes.filter(pk__in=recipe_ids)
+
+    updated = 0
+    last_pk = 0
+    while True:
+        batch = list(recipes.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            if updated:
+                # recipes.facets builds on this module
+                from .facets import bump_catalog_version
+                bump_catalog_version()
+            return updated
+        masks = dict.fromkeys((recipe.pk for recipe in batch), 0)
+        rows = (
+            Recipe.dietary_tags.through.objects
+            .filter(recipe_id__in=masks)
+            .values_list('recipe_id', 'dietarytag__name')
+        )
+        for recipe_id, name in rows:
+            masks[recipe_id] |= DIETARY_BITS.get(name, 0)
+        changed = [recipe for recipe in batch if recipe.dietary_mask != masks[recipe.pk]]
+        for recipe in changed:
+            recipe.dietary_mask = masks[recipe.pk]
+        Recipe.objects.bulk_update(changed, ['dietary_mask'])
+        updated += len(changed)
+        last_pk = batch[-1].pk
+
+
+class DietaryProfileMixin:
+    """List view mixin narrowing the listing to the user's dietary profile.
+
+    Logged-in users with restrictions in their profile only see recipes
+    fitting all of them, unless they ask for ``?diet=any``.
+    """
+
+    def get_dietary_mask(self):
+        if not hasattr(self, '_dietary_mask'):
+            if self.request.GET.get('diet') == 'any':
+                self._dietary_mask = 0
+            else:
+                self._dietary_mask = user_dietary_mask(self.request.user)
+        return self._dietary_mask
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        labels = dict(DietaryTag.DIETARY_CHOICES)
+        context['diet_profile'] = [labels[name] for name in tags_of(self.get_dietary_mask())]
+        context['diet_any'] = self.request.GET.get('diet') == 'any' and self.request.user.is_authenticated
+        # Same listing with the profile switched the other way, from the first page
+        params = self.request.GET.copy()
+        for name in ('cursor', 'page', 'diet'):
+            params.pop(name, None)
+        if not context['diet_any']:
+            params['diet'] = 'any'
+        context['diet_toggle_query'] = params.urlencode()
+        return context
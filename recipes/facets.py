@@ -0,0 +1,252 @@
+"""Faceted filtering for the product listing.
+
+``ProductFilters`` parses and normalizes the listing's query string and
+applies it to a queryset. ``get_facets`` returns the per-value counts the
+sidebar shows, computed with one grouped query per facet and cached under
+the normalized filter key. Cached counts are tied to a catalog version
+that the recipe signals bump, so any catalog change invalidates them all,
+in every worker sharing the cache.
+"""
+import hashlib
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Count, Q
+
+from blissbox.cache import CacheNamespace
+
+from .dietary import DIETARY_BITS, mask_of, matching, superset_masks
+from .models import DietaryTag, Recipe, RecipeCategory
+
+FACETS_TIMEOUT = 60 * 60
+
+# Everything derived from the published catalog; bumped on any change to it
+catalog_cache = CacheNamespace('catalog', timeout=FACETS_TIMEOUT)
+
+# Range filter name -> (label, unit, materialized per-serving column)
+NUTRITION_RANGES = {
+    'calories': ('Calories', 'kcal', 'calories_per_serving'),
+    'protein': ('Protein', 'g', 'protein_g_per_serving'),
+    'fat': ('Fat', 'g', 'fat_g_per_serving'),
+    'carbs': ('Carbs', 'g', 'carbs_g_per_serving'),
+}
+
+# (value, label, lower bound inclusive, upper bound exclusive)
+PRICE_BUCKETS = [
+    ('0-200', 'Under ₹200', None, Decimal('200')),
+    ('200-300', '₹200 – ₹300', Decimal('200'), Decimal('300')),
+    ('300-500', '₹300 – ₹500', Decimal('300'), Decimal('500')),
+    ('500-', '₹500 & above', Decimal('500'), None),
+]
+
+
+def _decimal(value):
+    try:
+        value = Decimal(value)
+    except (TypeError, ValueError, InvalidOperation):
+        return None
+    return value if value.is_finite() else None
+
+
+def _values(params, name):
+    """Values of a multi-valued parameter, given repeated or comma separated."""
+    values = []
+    for value in params.getlist(name):
+        values.extend(part.strip() for part in value.split(','))
+    return tuple(sorted({value for value in values if value}))
+
+
+def _price_bucket_q(bucket):
+    value, label, low, high = bucket
+    q = Q()
+    if low is not None:
+        q &= Q(base_price__gte=low)
+    if high is not None:
+        q &= Q(base_price__lt=high)
+    return q
+
+
+class ProductFilters:
+    """Normalized filters of the product listing.
+
+    Two query strings selecting the same products give the same ``key()``,
+    whatever their parameter order or spelling.
+    """
+
+    # Facets combining their selected values with OR; everything else is AND
+    DISJUNCTIVE = ('category', 'brand', 'price', 'difficulty')
+
+    def __init__(self, categories=(), brand='', price=(), min_price=None, max_price=None,
+                 min_cost=None, max_cost=None, available=False, dietary=(), difficulty=(),
+                 nutrition=None, profile_mask=0):
+        self.categories = tuple(categories)
+        self.brand = brand
+        self.price = tuple(price)
+        self.min_price = min_price
+        self.max_price = max_price
+        self.min_cost = min_cost
+        self.max_cost = max_cost
+        self.available = available
+        self.dietary = tuple(dietary)
+        # Restrictions of the user's dietary profile, on top of ``dietary``
+        self.profile_mask = profile_mask
+        self.difficulty = tuple(difficulty)
+        # Range filter name -> (min, max) per serving, either bound may be None
+        self.nutrition = {
+            name: bounds for name, bounds in (nutrition or {}).items()
+            if name in NUTRITION_RANGES and bounds != (None, None)
+        }
+
+    @classmethod
+    def from_query(cls, params, profile_mask=0):
+        buckets = {bucket[0] for bucket in PRICE_BUCKETS}
+        tags = {choice for choice, label in DietaryTag.DIETARY_CHOICES}
+        levels = {choice for choice, label in Recipe.DIFFICULTY_LEVELS}
+        return cls(
+            categories=_values(params, 'category') or _values(params, 'categories'),
+            brand=params.get('brand', '').strip().lower(),
+            price=[value for value in _values(params, 'price') if value in buckets],
+            min_price=_decimal(params.get('min_price')),
+            max_price=_decimal(params.get('max_price')),
+            min_cost=_decimal(params.get('min_cost')),
+            max_cost=_decimal(params.get('max_cost')),
+            available=params.get('available') == '1',
+            dietary=[value for value in _values(params, 'dietary') if value in tags],
+            difficulty=[value for value in _values(params, 'difficulty') if value in levels],
+            nutrition={
+                name: (_decimal(params.get(f'min_{name}')), _decimal(params.get(f'max_{name}')))
+                for name in NUTRITION_RANGES
+            },
+            profile_mask=profile_mask,
+        )
+
+    @property
+    def dietary_mask(self):
+        return mask_of(self.dietary) | self.profile_mask
+
+    def key(self):
+        parts = [
+            'c=' + ','.join(self.categories),
+            'b=' + self.brand,
+            'p=' + ','.join(self.price),
+            f'price={self.min_price}:{self.max_price}',
+            f'cost={self.min_cost}:{self.max_cost}',
+            # Seasonal availability changes with the date
+            'a=' + (date.today().isoformat() if self.available else ''),
+            f'd={self.dietary_mask}',
+            'l=' + ','.join(self.difficulty),
+            *(f'{name}={low}:{high}' for name, (low, high) in sorted(self.nutrition.items())),
+        ]
+        return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+    def apply(self, qs, skip=None):
+        """Filter ``qs``, leaving out the facet named ``skip``."""
+        if self.categories and skip != 'category':
+            qs = qs.filter(category__slug__in=self.categories)
+        if self.brand and skip != 'brand':
+            qs = qs.filter(created_by__username__iexact=self.brand)
+        if self.price and skip != 'price':
+            q = Q()
+            for bucket in PRICE_BUCKETS:
+                if bucket[0] in self.price:
+                    q |= _price_bucket_q(bucket)
+            qs = qs.filter(q)
+        if self.min_price is not None:
+            qs = qs.filter(base_price__gte=self.min_price)
+        if self.max_price is not None:
+            qs = qs.filter(base_price__lte=self.max_price)
+        # True ingredient cost per serving, from the materialized column
+        if self.min_cost is not None:
+            qs = qs.filter(cost_per_serving__gte=self.min_cost)
+        if self.max_cost is not None:
+            qs = qs.filter(cost_per_serving__lte=self.max_cost)
+        # Per-serving nutrition, from the materialized (and indexed) columns
+        for name, (low, high) in self.nutrition.items():
+            column = NUTRITION_RANGES[name][2]
+            if low is not None:
+                qs = qs.filter(**{f'{column}__gte': low})
+            if high is not None:
+                qs = qs.filter(**{f'{column}__lte': high})
+        if self.available:
+            today = date.today()
+            qs = qs.filter(
+                Q(is_seasonal=False) |
+                Q(available_from__lte=today, available_until__gte=today)
+            )
+        qs = matching(qs, self.dietary_mask)
+        if self.difficulty and skip != 'difficulty':
+            qs = qs.filter(difficulty__in=self.difficulty)
+        return qs
+
+
+def bump_catalog_version():
+    catalog_cache.bump()
+
+
+def count_facets(filters):
+    """Per-value counts of every facet: one grouped query each.
+
+    Disjunctive facets are counted with every filter except their own, so
+    their counts say what ticking one more value would add.
+    """
+    published = Recipe.objects.filter(is_published=True).order_by()
+
+    category_counts = dict(
+        filters.apply(published, skip='category')
+        .values_list('category_id')
+        .annotate(count=Count('id'))
+    )
+    categories = [
+        {'slug': slug, 'name': name, 'count': category_counts.get(pk, 0), 'selected': slug in filters.categories}
+        for pk, slug, name in RecipeCategory.objects.values_list('pk', 'slug', 'name')
+    ]
+
+    brands = [
+        {'value': username, 'count': count, 'selected': username.lower() == filters.brand}
+        for username, count in (
+            filters.apply(published, skip='brand')
+            .filter(created_by__isnull=False)
+            .values_list('created_by__username')
+            .annotate(count=Count('id'))
+            .order_by('created_by__username')
+        )
+    ]
+
+    price_counts = filters.apply(published, skip='price').aggregate(**{
+        bucket[0]: Count('id', filter=_price_bucket_q(bucket)) for bucket in PRICE_BUCKETS
+    })
+    price = [
+        {'value': value, 'label': label, 'count': price_counts[value], 'selected': value in filters.price}
+        for value, label, low, high in PRICE_BUCKETS
+    ]
+
+    tag_counts = filters.apply(published).aggregate(**{
+        name: Count('id', filter=Q(dietary_mask__in=superset_masks(bit))) for name, bit in DIETARY_BITS.items()
+    })
+    dietary = [
+        {'value': value, 'label': label, 'count': tag_counts.get(value, 0), 'selected': value in filters.dietary}
+        for value, label in DietaryTag.DIETARY_CHOICES
+    ]
+
+    level_counts = dict(
+        filters.apply(published, skip='difficulty')
+        .values_list('difficulty')
+        .annotate(count=Count('id'))
+    )
+    difficulty = [
+        {'value': value, 'label': label, 'count': level_counts.get(value, 0), 'selected': value in filters.difficulty}
+        for value, label in Recipe.DIFFICULTY_LEVELS
+    ]
+
+    return {
+        'categories': categories,
+        'brands': brands,
+        'price': price,
+        'dietary': dietary,
+        'difficulty': difficulty,
+    }
+
+
+def get_facets(filters):
+    """``count_facets`` for ``filters``, cached until the catalog changes."""
+    return catalog_cache.get_or_set(('facets', filters.key()), lambda: count_facets(filters))
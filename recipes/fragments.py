@@ -0,0 +1,102 @@
+"""Rendered fragment cache for the recipe list pages.
+
+Recipe cards are cached under the recipe id, ``updated_at`` and the
+calories they show, so saving a recipe or refreshing its nutrition moves
+its card to a new key by itself; the signals also delete the entry a save
+left stale to free the space. The category nav is cached under a
+version the category signals bump. A page of cards costs one
+``get_many`` plus one ``set_many`` for the misses.
+
+Hits and misses are counted in the cache, per fragment type, so every
+process contributes to the same totals; read them with
+``manage.py fragment_cache_stats``.
+"""
+from django.template.loader import render_to_string
+
+from blissbox.cache import CacheNamespace
+
+from .models import RecipeCategory
+
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+card_cache = CacheNamespace('recipe-cards', timeout=FRAGMENT_TIMEOUT)
+category_nav_cache = CacheNamespace('category-nav', timeout=FRAGMENT_TIMEOUT)
+# Resetting the stats bumps the namespace, zeroing every counter at once
+fragment_stats_cache = CacheNamespace('fragment-stats', timeout=None)
+
+# Fragment types with hit/miss counters
+CARD = 'card'
+CATEGORY_NAV = 'category-nav'
+FRAGMENTS = (CARD, CATEGORY_NAV)
+
+
+def _card_parts(recipe_id, updated_at, calories):
+    # Nutrition is refreshed without touching updated_at
+    return (recipe_id, updated_at.timestamp() if updated_at else 0, calories)
+
+
+def delete_card(recipe_id, updated_at, calories):
+    card_cache.delete(*_card_parts(recipe_id, updated_at, calories))
+
+
+def record(fragment, hits, misses):
+    for outcome, count in (('hits', hits), ('misses', misses)):
+        if count:
+            fragment_stats_cache.incr(fragment, outcome, delta=count)
+
+
+def fragment_stats():
+    """Hits, misses and hit ratio of each fragment type."""
+    parts = [(fragment, outcome) for fragment in FRAGMENTS for outcome in ('hits', 'misses')]
+    keys = dict(zip(parts, fragment_stats_cache.keys(parts)))
+    counts = fragment_stats_cache.cache.get_many(keys.values())
+    stats = {}
+    for fragment in FRAGMENTS:
+        hits = counts.get(keys[fragment, 'hits'], 0)
+        misses = counts.get(keys[fragment, 'misses'], 0)
+        total = hits + misses
+        stats[fragment] = {'hits': hits, 'misses': misses, 'ratio': hits / total if total else None}
+    return stats
+
+
+def reset_fragment_stats():
+    fragment_stats_cache.bump()
+
+
+def render_recipe_cards(recipes):
+    """HTML of one card per recipe, in order, rendering only the cache misses."""
+    recipes = list(recipes)
+    keys = card_cache.keys([_card_parts(recipe.pk, recipe.updated_at, recipe.calories_per_serving) for recipe in recipes])
+    cached = card_cache.cache.get_many(keys)
+
+    rendered = {}
+    cards = []
+    for key, recipe in zip(keys, recipes):
+        html = cached.get(key)
+        if html is None:
+            html = rendered[key] = render_to_string('recipes/includes/recipe_card.html', {'recipe': recipe})
+        cards.append(html)
+    if rendered:
+        card_cache.cache.set_many(rendered, FRAGMENT_TIMEOUT)
+    record(CARD, len(recipes) - len(rendered), len(rendered))
+    return cards
+
+
+def bump_category_nav_version():
+    category_nav_cache.bump()
+
+
+def render_category_nav(current_category=None):
+    """HTML of the category nav, with ``current_category`` highlighted."""
+    current = current_category.slug if current_category else ''
+    html = category_nav_cache.get(current)
+    if html is not None:
+        record(CATEGORY_NAV, 1, 0)
+        return html
+    html = render_to_string('recipes/includes/category_nav.html', {
+        'categories': RecipeCategory.objects.exclude(slug=''),
+        'current_slug': current,
+    })
+    category_nav_cache.set(html, current)
+    record(CATEGORY_NAV, 0, 1)
+    return html
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from recipes.fragments import fragment_stats, reset_fragment_stats
+
+
+class Command(BaseCommand):
+    help = "Show hit/miss counts of the recipe fragment cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Zero the counters afterwards.")
+
+    def handle(self, *args, **options):
+        for fragment, stats in fragment_stats().items():
+            ratio = f"{stats['ratio']:.1%}" if stats['ratio'] is not None else "n/a"
+            self.stdout.write(f"{fragment}: {stats['hits']} hits, {stats['misses']} misses, {ratio} hit ratio")
+        if options['reset']:
+            reset_fragment_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from recipes.nutrition import refresh_nutrition
+
+
+class Command(BaseCommand):
+    help = "Rebuild the materialized per-serving nutrition columns of Recipe in bulk."
+
+    def add_arguments(self, parser):
+        parser.add_argument('recipe_ids', nargs='*', type=int, help="Only rebuild these recipes.")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        recipe_ids = options['recipe_ids'] or None
+        count = refresh_nutrition(recipe_ids, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt nutrition for {count} recipes."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from recipes.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the recipe full-text search index from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = get_search_backend().rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} recipes for search."))
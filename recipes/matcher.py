@@ -0,0 +1,139 @@
+"""In-process "cook with what I have" matcher.
+
+Ranks published recipes by how much of them a user's pantry covers: the
+fraction of their required (non optional) ingredient lines the pantry
+holds, unexpired, in at least the quantity the servings call for.
+
+The matcher keeps an inverted index from ingredient id to the recipe
+lines using it, so matching a pantry only walks the postings of the
+ingredients in it and never loads recipes. The index is loaded on first
+use with one query; ``recipes.signals`` call ``invalidate()`` on recipe
+and ingredient line changes, which drops it here and bumps a version in
+the shared cache that the other processes check at most every
+``VERSION_CHECK_INTERVAL`` seconds.
+"""
+import threading
+import time
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+
+from blissbox.cache import CacheNamespace
+from users.models import PantryIngredient
+from .models import RecipeIngredient
+
+VERSION_CHECK_INTERVAL = 5
+
+matcher_cache = CacheNamespace('pantry-matcher')
+
+PantryMatch = namedtuple('PantryMatch', ['recipe_id', 'covered', 'required', 'coverage', 'missing'])
+
+
+def pantry_contents(user, on=None):
+    """Ingredient id -> quantity available of ``user``'s unexpired pantry items."""
+    if not user.is_authenticated:
+        return {}
+    return dict(
+        PantryIngredient.objects
+        .filter(pantry__user=user)
+        .unexpired(on)
+        .values_list('ingredient_id', 'quantity_available')
+    )
+
+
+class PantryMatcher:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}  # ingredient id -> [(recipe id, quantity at default servings)]
+        self._lines = {}  # recipe id -> ((ingredient id, quantity at default servings), ...)
+        self._default_servings = {}  # recipe id -> default servings
+        self._loaded_at = None
+        self._checked_at = None
+        self._version = None
+
+    def load(self):
+        """Read the required lines of every published recipe: one query."""
+        version = matcher_cache.version()
+        postings = defaultdict(list)
+        lines = defaultdict(list)
+        default_servings = {}
+        rows = (
+            RecipeIngredient.objects
+            .filter(recipe__is_published=True, is_optional=False)
+            .order_by()
+            .values_list('recipe_id', 'ingredient_id', 'quantity', 'recipe__default_servings')
+        )
+        for recipe_id, ingredient_id, quantity, servings in rows:
+            postings[ingredient_id].append((recipe_id, quantity))
+            lines[recipe_id].append((ingredient_id, quantity))
+            default_servings[recipe_id] = servings or 1
+        with self._lock:
+            self._postings = dict(postings)
+            self._lines = {recipe_id: tuple(recipe_lines) for recipe_id, recipe_lines in lines.items()}
+            self._default_servings = default_servings
+            self._loaded_at = self._checked_at = time.monotonic()
+            self._version = version
+
+    def ensure_loaded(self):
+        now = time.monotonic()
+        if self._loaded_at is None:
+            self.load()
+        elif now - self._checked_at > VERSION_CHECK_INTERVAL:
+            self._checked_at = now
+            if matcher_cache.version() != self._version:
+                self.load()
+
+    def invalidate(self):
+        """Reload on next use, here and in every other process."""
+        matcher_cache.bump()
+        self._loaded_at = None
+
+    def match(self, contents, servings=None, limit=None, min_coverage=0):
+        """Recipes covered by ``contents`` (ingredient id -> quantity), best first.
+
+        Quantities are compared for ``servings`` (each recipe's default
+        servings if None). Recipes are ranked by coverage, then by the
+        fewest missing ingredients, newest recipes first among equals.
+        """
+        self.ensure_loaded()
+        with self._lock:
+            postings = self._postings
+            lines = self._lines
+            default_servings = self._default_servings
+
+        def needed(recipe_id, quantity):
+            if servings is None:
+                return quantity
+            return quantity * Decimal(servings) / Decimal(default_servings[recipe_id])
+
+        covered = defaultdict(int)
+        for ingredient_id, available in contents.items():
+            for recipe_id, quantity in postings.get(ingredient_id, ()):
+                if available >= needed(recipe_id, quantity):
+                    covered[recipe_id] += 1
+
+        matches = []
+        for recipe_id, count in covered.items():
+            required = len(lines[recipe_id])
+            coverage = count / required
+            if coverage >= min_coverage:
+                matches.append((recipe_id, count, required, coverage))
+        matches.sort(key=lambda match: (-match[3], match[2] - match[1], -match[0]))
+        if limit is not None:
+            matches = matches[:limit]
+
+        results = []
+        for recipe_id, count, required, coverage in matches:
+            missing = [
+                ingredient_id for ingredient_id, quantity in lines[recipe_id]
+                if contents.get(ingredient_id, 0) < needed(recipe_id, quantity)
+            ]
+            results.append(PantryMatch(recipe_id, count, required, coverage, missing))
+        return results
+
+
+pantry_matcher = PantryMatcher()
+
+
+def match_pantry(user, servings=None, limit=None, min_coverage=0):
+    """Recipes ``user`` can cook from their pantry, see ``PantryMatcher.match``."""
+    return pantry_matcher.match(pantry_contents(user), servings, limit, min_coverage)
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:55
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_cost_per_serving(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    RecipeIngredient = apps.get_model("recipes", "RecipeIngredient")
+
+    totals = {}
+    rows = RecipeIngredient.objects.values_list(
+        "recipe_id", "quantity", "ingredient__base_price_per_unit"
+    )
+    for recipe_id, quantity, unit_price in rows:
+        totals[recipe_id] = (
+            totals.get(recipe_id, Decimal("0.00")) + quantity * unit_price
+        )
+
+    recipes = list(Recipe.objects.only("pk", "default_servings"))
+    for recipe in recipes:
+        per_serving = totals.get(recipe.pk, Decimal("0.00")) / Decimal(
+            recipe.default_servings or 1
+        )
+        recipe.cost_per_serving = per_serving.quantize(Decimal("0.000001"))
+    Recipe.objects.bulk_update(recipes, ["cost_per_serving"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0002_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="cost_per_serving",
+            field=models.DecimalField(
+                blank=True, decimal_places=6, editable=False, max_digits=14, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["is_published", "cost_per_serving"],
+                name="recipes_rec_is_publ_810721_idx",
+            ),
+        ),
+        migrations.RunPython(populate_cost_per_serving, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:12
+
+from collections import defaultdict
+
+from django.db import migrations
+
+FTS_TABLE = "recipes_recipe_fts"
+FTS_COLUMNS = ("name", "description", "instructions", "ingredients", "tags")
+
+TAG_LABELS = {
+    "vegan": "Vegan",
+    "gluten_free": "Gluten Free",
+    "dairy_free": "Dairy Free",
+    "nut_free": "Nut Free",
+    "low_sugar": "Low Sugar",
+    "keto": "Keto",
+    "paleo": "Paleo",
+}
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    Recipe = apps.get_model("recipes", "Recipe")
+    RecipeIngredient = apps.get_model("recipes", "RecipeIngredient")
+
+    ingredients = defaultdict(list)
+    for recipe_id, name in RecipeIngredient.objects.values_list(
+        "recipe_id", "ingredient__name"
+    ):
+        ingredients[recipe_id].append(name)
+    tags = defaultdict(list)
+    for recipe_id, name in Recipe.dietary_tags.through.objects.values_list(
+        "recipe_id", "dietarytag__name"
+    ):
+        tags[recipe_id].append(TAG_LABELS.get(name, name))
+
+    documents = [
+        (
+            pk,
+            name,
+            description,
+            instructions,
+            " ".join(ingredients[pk]),
+            " ".join(tags[pk]),
+        )
+        for pk, name, description, instructions in Recipe.objects.filter(
+            is_published=True
+        ).values_list("pk", "name", "description", "instructions")
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            f"USING fts5({', '.join(FTS_COLUMNS)}, tokenize='porter unicode61')"
+        )
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)}) "
+            f"VALUES ({', '.join(['%s'] * (len(FTS_COLUMNS) + 1))})",
+            documents,
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0003_recipe_cost_per_serving"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
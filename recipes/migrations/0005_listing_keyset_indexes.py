@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0004_recipe_search_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="recipe",
+            name="recipes_rec_is_publ_b5a4f1_idx",
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                condition=models.Q(("is_published", True)),
+                fields=["-created_at", "-id"],
+                name="recipe_published_newest_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                condition=models.Q(("is_published", True)),
+                fields=["base_price", "id"],
+                name="recipe_published_price_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                condition=models.Q(("is_published", True)),
+                fields=["name", "id"],
+                name="recipe_published_name_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                condition=models.Q(("is_published", True)),
+                fields=["category", "-created_at", "-id"],
+                name="recipe_category_newest_idx",
+            ),
+        ),
+    ]
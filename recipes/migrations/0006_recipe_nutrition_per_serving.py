@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:18
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+NUTRIENTS = ("calories", "protein_g", "fat_g", "carbs_g")
+
+
+def populate_nutrition(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    RecipeIngredient = apps.get_model("recipes", "RecipeIngredient")
+
+    totals = {}
+    rows = RecipeIngredient.objects.values_list(
+        "recipe_id", "quantity", *[f"ingredient__{nutrient}" for nutrient in NUTRIENTS]
+    )
+    for recipe_id, quantity, *amounts in rows:
+        recipe_totals = totals.setdefault(recipe_id, [Decimal("0")] * len(NUTRIENTS))
+        for i, amount in enumerate(amounts):
+            recipe_totals[i] += quantity * amount
+
+    recipes = list(Recipe.objects.only("pk", "default_servings"))
+    for recipe in recipes:
+        default_servings = Decimal(recipe.default_servings or 1)
+        recipe_totals = totals.get(recipe.pk, [Decimal("0")] * len(NUTRIENTS))
+        for nutrient, total in zip(NUTRIENTS, recipe_totals):
+            setattr(
+                recipe,
+                f"{nutrient}_per_serving",
+                (total / default_servings).quantize(Decimal("0.001")),
+            )
+    Recipe.objects.bulk_update(
+        recipes,
+        [f"{nutrient}_per_serving" for nutrient in NUTRIENTS],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0005_listing_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="calories_per_serving",
+            field=models.DecimalField(
+                blank=True, decimal_places=3, editable=False, max_digits=12, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="carbs_g_per_serving",
+            field=models.DecimalField(
+                blank=True, decimal_places=3, editable=False, max_digits=12, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="fat_g_per_serving",
+            field=models.DecimalField(
+                blank=True, decimal_places=3, editable=False, max_digits=12, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="protein_g_per_serving",
+            field=models.DecimalField(
+                blank=True, decimal_places=3, editable=False, max_digits=12, null=True
+            ),
+        ),
+        migrations.RunPython(populate_nutrition, migrations.RunPython.noop),
+    ]
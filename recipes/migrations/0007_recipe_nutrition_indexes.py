@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0006_recipe_nutrition_per_serving"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                condition=models.Q(("is_published", True)),
+                fields=["calories_per_serving"],
+                name="recipe_published_calories_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                condition=models.Q(("is_published", True)),
+                fields=["protein_g_per_serving"],
+                name="recipe_published_protein_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                condition=models.Q(("is_published", True)),
+                fields=["fat_g_per_serving"],
+                name="recipe_published_fat_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                condition=models.Q(("is_published", True)),
+                fields=["carbs_g_per_serving"],
+                name="recipe_published_carbs_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Bit order of recipes.dietary at the time of this migration
+DIETARY_TAGS = (
+    "vegan",
+    "gluten_free",
+    "dairy_free",
+    "nut_free",
+    "low_sugar",
+    "keto",
+    "paleo",
+)
+
+
+def populate_dietary_mask(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    bits = {name: 1 << i for i, name in enumerate(DIETARY_TAGS)}
+
+    masks = {}
+    rows = Recipe.dietary_tags.through.objects.values_list(
+        "recipe_id", "dietarytag__name"
+    )
+    for recipe_id, name in rows:
+        masks[recipe_id] = masks.get(recipe_id, 0) | bits.get(name, 0)
+
+    recipes = list(Recipe.objects.filter(pk__in=masks).only("pk"))
+    for recipe in recipes:
+        recipe.dietary_mask = masks[recipe.pk]
+    Recipe.objects.bulk_update(recipes, ["dietary_mask"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0007_recipe_nutrition_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="dietary_mask",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                condition=models.Q(("is_published", True)),
+                fields=["dietary_mask"],
+                name="recipe_published_dietary_idx",
+            ),
+        ),
+        migrations.RunPython(populate_dietary_mask, migrations.RunPython.noop),
+    ]
@@ -2,7 +2,8 @@ from django.db import models
 from django.core.validators import MinValueValidator
 from django.utils.text import slugify
 from ingredients.models import Ingredient
-from django.db.models import F, Sum
+from blissbox.tracking import TracksLoadedValues
+from django.db.models import Q
 from decimal import Decimal
 
 class RecipeCategory(models.Model):
@@ -38,7 +39,18 @@ class DietaryTag(models.Model):
         return self.get_name_display()
 
 
-class Recipe(models.Model):
+# Recipe columns derived from its ingredient lines and dietary tags
+DERIVED_FIELDS = (
+    'cost_per_serving',
+    'calories_per_serving',
+    'protein_g_per_serving',
+    'fat_g_per_serving',
+    'carbs_g_per_serving',
+    'dietary_mask',
+)
+
+
+class Recipe(TracksLoadedValues, models.Model):
     DIFFICULTY_LEVELS = [
         ('easy', 'Easy'),
         ('medium', 'Medium'),
@@ -56,6 +68,8 @@ class Recipe(models.Model):
         related_name='recipes'
     )
     dietary_tags = models.ManyToManyField(DietaryTag, blank=True)
+    # One bit per dietary tag (see recipes.dietary), kept in sync by recipes.signals
+    dietary_mask = models.PositiveIntegerField(default=0, editable=False)
     difficulty = models.CharField(
         max_length=10,
         choices=DIFFICULTY_LEVELS,
@@ -83,6 +97,28 @@ class Recipe(models.Model):
         decimal_places=2,
         validators=[MinValueValidator(Decimal('0.01'))]
     )
+    # Ingredient cost of one serving, kept up to date by recipes.signals
+    cost_per_serving = models.DecimalField(
+        max_digits=14,
+        decimal_places=6,
+        null=True,
+        blank=True,
+        editable=False
+    )
+    
+    # Nutrition of one serving, kept up to date by recipes.signals
+    calories_per_serving = models.DecimalField(
+        max_digits=12, decimal_places=3, null=True, blank=True, editable=False
+    )
+    protein_g_per_serving = models.DecimalField(
+        max_digits=12, decimal_places=3, null=True, blank=True, editable=False
+    )
+    fat_g_per_serving = models.DecimalField(
+        max_digits=12, decimal_places=3, null=True, blank=True, editable=False
+    )
+    carbs_g_per_serving = models.DecimalField(
+        max_digits=12, decimal_places=3, null=True, blank=True, editable=False
+    )
     
     # Availability
     is_published = models.BooleanField(default=False)
@@ -103,7 +139,23 @@ class Recipe(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['slug']),
-            models.Index(fields=['is_published', '-created_at']),
+            # Listing orders over published recipes, each ending in the id so
+            # cursors can resume from them
+            models.Index(fields=['-created_at', '-id'], name='recipe_published_newest_idx', condition=Q(is_published=True)),
+            models.Index(fields=['base_price', 'id'], name='recipe_published_price_idx', condition=Q(is_published=True)),
+            models.Index(fields=['name', 'id'], name='recipe_published_name_idx', condition=Q(is_published=True)),
+            models.Index(
+                fields=['category', '-created_at', '-id'],
+                name='recipe_category_newest_idx',
+                condition=Q(is_published=True),
+            ),
+            models.Index(fields=['is_published', 'cost_per_serving']),
+            models.Index(fields=['dietary_mask'], name='recipe_published_dietary_idx', condition=Q(is_published=True)),
+            # Nutrition range filters of the product listing
+            models.Index(fields=['calories_per_serving'], name='recipe_published_calories_idx', condition=Q(is_published=True)),
+            models.Index(fields=['protein_g_per_serving'], name='recipe_published_protein_idx', condition=Q(is_published=True)),
+            models.Index(fields=['fat_g_per_serving'], name='recipe_published_fat_idx', condition=Q(is_published=True)),
+            models.Index(fields=['carbs_g_per_serving'], name='recipe_published_carbs_idx', condition=Q(is_published=True)),
         ]
     
     def __str__(self):
@@ -111,18 +163,29 @@ class Recipe(models.Model):
 
     def get_total_cost_for_servings(self, servings):
         """Sum of all ingredient costs for the given servings."""
-        total = Decimal('0.00')
-        for ri in self.ingredients.all():
-            total += ri.get_price_for_servings(servings)
-        return total
+        from .pricing import get_total_cost
+        return get_total_cost(self, servings)
 
     def get_total_cost_for_default_servings(self):
         """Sum of ingredient costs for the recipe's default servings."""
+        prefetched = 'ingredients' in getattr(self, '_prefetched_objects_cache', {})
+        if self.cost_per_serving is not None and not prefetched:
+            return self.cost_per_serving * (self.default_servings or 1)
         return self.get_total_cost_for_servings(self.default_servings or 1)
     
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        # The derived columns are written by recipes.signals with bulk
+        # updates; saving an instance loaded before one of those must not
+        # put the old values back, so leave them out unless set on purpose
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kept = {name for name in DERIVED_FIELDS if not self.field_changed(name)}
+            if kept:
+                kwargs['update_fields'] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in kept
+                ]
         super().save(*args, **kwargs)
     
     @property
@@ -143,27 +206,13 @@ class Recipe(models.Model):
         return True
     
     def get_nutritional_info(self, servings=None):
-        if servings is None:
-            servings = self.default_servings
-        
-        multiplier = Decimal(servings) / Decimal(self.default_servings)
-        
-        nutrients = self.ingredients.aggregate(
-            total_calories=Sum(F('quantity') * F('ingredient__calories')),
-            total_protein=Sum(F('quantity') * F('ingredient__protein_g')),
-            total_fat=Sum(F('quantity') * F('ingredient__fat_g')),
-            total_carbs=Sum(F('quantity') * F('ingredient__carbs_g')),
-        )
-        
-        return {
-            'calories': int((nutrients['total_calories'] or 0) * multiplier),
-            'protein_g': float((nutrients['total_protein'] or 0) * multiplier),
-            'fat_g': float((nutrients['total_fat'] or 0) * multiplier),
-            'carbs_g': float((nutrients['total_carbs'] or 0) * multiplier),
-        }
+        """Calories and macros for ``servings`` (the default servings if None),
+        from the materialized per-serving columns once they are filled."""
+        from .nutrition import get_nutrition
+        return get_nutrition([self], servings)[self.pk]
 
 
-class RecipeIngredient(models.Model):
+class RecipeIngredient(TracksLoadedValues, models.Model):
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
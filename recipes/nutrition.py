@@ -0,0 +1,146 @@
+"""Recipe nutrition.
+
+Nutrition is derived from ``RecipeIngredient.quantity`` and the macro
+fields of ``Ingredient``, like prices are. The per-serving totals are
+materialized on ``Recipe`` (``calories_per_serving`` and friends) and kept
+up to date by ``recipes.signals``, so showing or filtering on nutrition
+costs no query of its own. ``get_nutrition`` answers for many recipes at
+once, with a single aggregate for those whose columns are not filled yet.
+"""
+from decimal import Decimal
+
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+
+from .facets import bump_catalog_version
+from .models import Recipe, RecipeIngredient
+
+# Nutrient -> Ingredient field holding its amount per unit
+NUTRIENTS = {
+    'calories': 'calories',
+    'protein_g': 'protein_g',
+    'fat_g': 'fat_g',
+    'carbs_g': 'carbs_g',
+}
+
+# Nutrient -> materialized Recipe column
+NUTRITION_COLUMNS = {nutrient: f'{nutrient}_per_serving' for nutrient in NUTRIENTS}
+
+# Ingredient fields whose changes make the columns stale
+INGREDIENT_FIELDS = tuple(NUTRIENTS.values())
+
+NUTRITION_QUANTUM = Decimal('0.001')
+
+LINE_NUTRIENTS = {
+    nutrient: Sum(ExpressionWrapper(
+        F('quantity') * F(f'ingredient__{field}'),
+        output_field=DecimalField(max_digits=20, decimal_places=5),
+    ))
+    for nutrient, field in NUTRIENTS.items()
+}
+
+
+def nutrition_dict(per_serving, servings):
+    """The ``get_nutritional_info`` dict for ``servings`` servings."""
+    servings = Decimal(servings)
+    amounts = {nutrient: (per_serving.get(nutrient) or 0) * servings for nutrient in NUTRIENTS}
+    return {
+        'calories': int(amounts['calories']),
+        'protein_g': float(amounts['protein_g']),
+        'fat_g': float(amounts['fat_g']),
+        'carbs_g': float(amounts['carbs_g']),
+    }
+
+
+def stored_per_serving(recipe):
+    """Materialized per-serving amounts of ``recipe``, None if not filled yet."""
+    values = {nutrient: getattr(recipe, column, None) for nutrient, column in NUTRITION_COLUMNS.items()}
+    if any(value is None for value in values.values()):
+        return None
+    return values
+
+
+def compute_per_serving(recipes):
+    """Per-serving amounts of many recipes from one grouped aggregate."""
+    recipes = list(recipes)
+    rows = (
+        RecipeIngredient.objects
+        .filter(recipe_id__in=[recipe.pk for recipe in recipes])
+        .order_by()
+        .values('recipe_id')
+        .annotate(**LINE_NUTRIENTS)
+    )
+    totals = {row['recipe_id']: row for row in rows}
+
+    amounts = {}
+    for recipe in recipes:
+        row = totals.get(recipe.pk, {})
+        default_servings = Decimal(recipe.default_servings or 1)
+        amounts[recipe.pk] = {
+            nutrient: ((row.get(nutrient) or Decimal('0')) / default_servings).quantize(NUTRITION_QUANTUM)
+            for nutrient in NUTRIENTS
+        }
+    return amounts
+
+
+def get_nutrition(recipes, servings=None):
+    """Nutrition of many recipes, keyed by recipe id.
+
+    ``servings`` is either one value applied to every recipe, a mapping of
+    recipe id to servings, or ``None`` for each recipe's default servings.
+    Recipes with materialized columns cost nothing; the others share one
+    aggregate query.
+    """
+    recipes = list(recipes)
+    per_serving = {}
+    missing = []
+    for recipe in recipes:
+        stored = stored_per_serving(recipe)
+        if stored is None:
+            missing.append(recipe)
+        else:
+            per_serving[recipe.pk] = stored
+    if missing:
+        per_serving.update(compute_per_serving(missing))
+
+    nutrition = {}
+    for recipe in recipes:
+        if servings is None:
+            recipe_servings = recipe.default_servings or 1
+        elif isinstance(servings, dict):
+            recipe_servings = servings.get(recipe.pk, recipe.default_servings or 1)
+        else:
+            recipe_servings = servings
+        nutrition[recipe.pk] = nutrition_dict(per_serving[recipe.pk], recipe_servings)
+    return nutrition
+
+
+def refresh_nutrition(recipe_ids=None, batch_size=500):
+    """Recompute the nutrition columns of ``recipe_ids`` (all recipes if None).
+
+    Each batch costs a select, one aggregate query and one bulk UPDATE;
+    returns the number of recipes refreshed.
+    """
+    columns = list(NUTRITION_COLUMNS.values())
+    recipes = Recipe.objects.order_by('pk').only('pk', 'default_servings', *columns)
+    if recipe_ids is not None:
+        recipe_ids = set(recipe_ids)
+        if not recipe_ids:
+            return 0
+        recipes = recipes.filter(pk__in=recipe_ids)
+
+    refreshed = 0
+    last_pk = 0
+    while True:
+        batch = list(recipes.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            if refreshed:
+                # Nutrition filters and the cards showing calories read the columns
+                bump_catalog_version()
+            return refreshed
+        amounts = compute_per_serving(batch)
+        for recipe in batch:
+            for nutrient, column in NUTRITION_COLUMNS.items():
+                setattr(recipe, column, amounts[recipe.pk][nutrient])
+        Recipe.objects.bulk_update(batch, columns)
+        refreshed += len(batch)
+        last_pk = batch[-1].pk
@@ -0,0 +1,207 @@
+"""Keyset (cursor) pagination for the catalog listings.
+
+Offset pagination needs a ``COUNT(*)`` and scans every skipped row, so deep
+pages get slower as the catalog grows. A cursor instead carries the sort
+values of the last row shown, and the next page is the rows ordered after
+it, which an index on the same columns answers directly whatever the depth.
+Orderings must end in a unique column (``id``) so no row is skipped or
+repeated between pages.
+"""
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class CursorPaginator:
+    """Pages of ``queryset`` ordered by ``ordering``, e.g. ``('-created_at', '-id')``.
+
+    ``count`` is only queried if something reads it.
+    """
+
+    is_cursor = True
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.keys = [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    @cached_property
+    def count(self):
+        return self.queryset.order_by().count()
+
+    def encode(self, obj, direction):
+        values = [_plain(getattr(obj, name)) for name, descending in self.keys]
+        payload = json.dumps([direction, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if direction not in (NEXT, PREVIOUS) or len(values) != len(self.keys):
+                raise ValueError
+            return direction, [self.to_python(name, value) for (name, descending), value in zip(self.keys, values)]
+        except (TypeError, ValueError, ValidationError) as e:
+            raise InvalidCursor(cursor) from e
+
+    def to_python(self, name, value):
+        if value is None:
+            raise ValueError('Cursor columns must not be null')
+        try:
+            field = self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotations such as order counts
+            return int(value)
+        return field.to_python(value)
+
+    def after(self, values, backwards=False):
+        """Rows strictly after ``values`` in the ordering (before, if ``backwards``)."""
+        condition = Q()
+        for i, (name, descending) in enumerate(self.keys):
+            lookup = 'lt' if descending != backwards else 'gt'
+            term = Q(**{f'{name}__{lookup}': values[i]})
+            for j in range(i):
+                term &= Q(**{self.keys[j][0]: values[j]})
+            condition |= term
+        # A plain range on the leading column lets the database walk the
+        # index in order instead of sorting every row matching the OR
+        name, descending = self.keys[0]
+        bound = Q(**{f"{name}__{'lte' if descending != backwards else 'gte'}": values[0]})
+        return bound & condition
+
+    def page(self, cursor=None):
+        direction, values = self.decode(cursor) if cursor else (NEXT, None)
+        backwards = direction == PREVIOUS
+        if backwards:
+            ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+        else:
+            ordering = self.ordering
+        qs = self.queryset.order_by(*ordering)
+        if values is not None:
+            qs = qs.filter(self.after(values, backwards))
+
+        rows = list(qs[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            return CursorPage(rows, self, has_next=True, has_previous=more)
+        return CursorPage(rows, self, has_next=more, has_previous=values is not None)
+
+
+class CursorPage:
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next and bool(object_list)
+        self._has_previous = has_previous and bool(object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        return self.paginator.encode(self.object_list[-1], NEXT) if self._has_next else None
+
+    @property
+    def previous_cursor(self):
+        return self.paginator.encode(self.object_list[0], PREVIOUS) if self._has_previous else None
+
+
+class CursorPaginationMixin:
+    """Cursor pagination mode for a ``ListView``.
+
+    Requests carrying a ``cursor`` parameter (empty for the first page) are
+    paged with ``CursorPaginator`` over ``get_cursor_ordering()``; others
+    keep offset pagination, as do views whose current ordering has no
+    cursor form. In cursor mode ``count=0`` skips the exact count.
+    """
+
+    cursor_param = 'cursor'
+
+    def get_cursor_ordering(self):
+        """Order by strings ending in a unique column, or None for offset only."""
+        return None
+
+    def use_cursor(self):
+        return self.cursor_param in self.request.GET and self.get_cursor_ordering() is not None
+
+    def wants_count(self):
+        return not self.use_cursor() or self.request.GET.get('count') != '0'
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_cursor():
+            return super().paginate_queryset(queryset, page_size)
+        paginator = CursorPaginator(queryset, page_size, self.get_cursor_ordering())
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_param))
+        except InvalidCursor:
+            raise Http404('Invalid cursor.')
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def page_params(self):
+        """The request's parameters less the page position."""
+        params = self.request.GET.copy()
+        params.pop('page', None)
+        params.pop(self.cursor_param, None)
+        return params
+
+    def page_links(self, page):
+        """Query strings of the next and previous pages, other parameters kept."""
+        params = self.page_params()
+        links = {'next_page_query': '', 'previous_page_query': ''}
+        if page is None:
+            return links
+        for name, has_page in (('next', page.has_next()), ('previous', page.has_previous())):
+            if not has_page:
+                continue
+            query = params.copy()
+            if isinstance(page, CursorPage):
+                query[self.cursor_param] = getattr(page, f'{name}_cursor')
+            else:
+                query['page'] = getattr(page, f'{name}_page_number')()
+            links[f'{name}_page_query'] = query.urlencode()
+        return links
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(self.page_links(context.get('page_obj')))
+        context['page_params'] = self.page_params().urlencode()
+        return context
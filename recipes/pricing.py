@@ -0,0 +1,326 @@
+"""Recipe pricing engine.
+
+Prices are always derived from ``RecipeIngredient.quantity`` and
+``Ingredient.base_price_per_unit``. This module computes them for one or
+many recipes without the per-ingredient queries that walking
+``recipe.ingredients.all()`` costs: either with a single grouped aggregate,
+or from a ``PriceVector`` loaded once (or taken from a prefetch cache).
+
+Pantry-adjusted prices leave out the lines whose ingredient the user has
+in their pantry, unexpired; which lines those are is found with one
+``EXISTS`` join against ``PantryIngredient`` for any number of recipes.
+"""
+import hashlib
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+
+from django.db.models import DecimalField, Exists, ExpressionWrapper, F, OuterRef, Q, Sum
+
+from blissbox.cache import CacheNamespace
+from users.models import PantryIngredient
+
+from .facets import bump_catalog_version
+from .models import Recipe, RecipeIngredient
+
+
+# Cost of one RecipeIngredient row at the recipe's default servings.
+LINE_COST = ExpressionWrapper(
+    F('quantity') * F('ingredient__base_price_per_unit'),
+    output_field=DecimalField(max_digits=20, decimal_places=5),
+)
+
+COST_PER_SERVING_QUANTUM = Decimal('0.000001')
+
+# Matrices are keyed by their price version, so they never go stale
+PRICE_MATRIX_TIMEOUT = 60 * 60 * 24
+price_matrix_cache = CacheNamespace('price-matrix', timeout=PRICE_MATRIX_TIMEOUT)
+
+PriceLine = namedtuple('PriceLine', ['id', 'ingredient_id', 'quantity', 'unit_price'])
+
+
+def servings_multiplier(servings, default_servings):
+    return Decimal(servings) / Decimal(default_servings or 1)
+
+
+class PriceVector:
+    """Quantities and unit prices of every ingredient line of one recipe.
+
+    Once loaded, a vector prices any servings/exclusion combination without
+    touching the database, using the same arithmetic as
+    ``RecipeIngredient.get_price_for_servings``.
+    """
+
+    def __init__(self, recipe_id, default_servings, lines):
+        self.recipe_id = recipe_id
+        self.default_servings = default_servings or 1
+        self.lines = list(lines)
+        self._by_id = {line.id: line for line in self.lines}
+        self._by_ingredient = {line.ingredient_id: line for line in self.lines}
+
+    @classmethod
+    def for_recipe(cls, recipe):
+        """Vector for one recipe, reusing ``ingredients__ingredient`` prefetches."""
+        prefetched = getattr(recipe, '_prefetched_objects_cache', {}).get('ingredients')
+        ingredient_field = RecipeIngredient._meta.get_field('ingredient')
+        if prefetched is not None and all(ingredient_field.is_cached(ri) for ri in prefetched):
+            lines = [
+                PriceLine(ri.id, ri.ingredient_id, ri.quantity, ri.ingredient.base_price_per_unit)
+                for ri in prefetched
+            ]
+            return cls(recipe.pk, recipe.default_servings, lines)
+        return cls.for_recipes([recipe])[recipe.pk]
+
+    @classmethod
+    def for_recipes(cls, recipes):
+        """Vectors for many recipes, keyed by recipe id, loaded with one query."""
+        recipes = list(recipes)
+        rows = (
+            RecipeIngredient.objects
+            .filter(recipe_id__in=[recipe.pk for recipe in recipes])
+            .order_by('recipe_id', 'id')
+            .values_list('recipe_id', 'id', 'ingredient_id', 'quantity', 'ingredient__base_price_per_unit')
+        )
+        lines = defaultdict(list)
+        for recipe_id, line_id, ingredient_id, quantity, unit_price in rows:
+            lines[recipe_id].append(PriceLine(line_id, ingredient_id, quantity, unit_price))
+        return {
+            recipe.pk: cls(recipe.pk, recipe.default_servings, lines[recipe.pk])
+            for recipe in recipes
+        }
+
+    def line_price(self, line, servings):
+        multiplier = Decimal(servings) / Decimal(self.default_servings)
+        adjusted_quantity = line.quantity * multiplier
+        return line.unit_price * adjusted_quantity
+
+    def total(self, servings, excluded=()):
+        """Sum of ingredient costs for ``servings``, skipping ``excluded`` line ids."""
+        excluded = set(excluded)
+        total = Decimal('0.00')
+        for line in self.lines:
+            if line.id not in excluded:
+                total += self.line_price(line, servings)
+        return total
+
+    def resolve(self, ids):
+        """Map client supplied ids to RecipeIngredient ids of this recipe.
+
+        Each id is tried as an ``Ingredient.id`` first and then as a
+        ``RecipeIngredient.id``; ids matching neither are dropped.
+        """
+        resolved = set()
+        for value in ids:
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                continue
+            line = self._by_ingredient.get(value) or self._by_id.get(value)
+            if line is not None:
+                resolved.add(line.id)
+        return resolved
+
+
+def quote(vector, servings, excluded=()):
+    """Base price, savings and final price of one customised recipe.
+
+    ``excluded`` holds client supplied ids, see ``PriceVector.resolve``.
+    """
+    base_price = vector.total(servings)
+    final_price = vector.total(servings, excluded=vector.resolve(excluded))
+    savings = base_price - final_price
+    if final_price < Decimal('0.00'):
+        final_price = Decimal('0.00')
+    return {
+        'base_price': base_price,
+        'savings': savings,
+        'final_price': final_price,
+    }
+
+
+def price_version(vector):
+    """Short digest of everything the prices of a recipe depend on."""
+    parts = [str(vector.default_servings)]
+    for line in sorted(vector.lines, key=lambda line: line.id):
+        parts.append(f'{line.id}:{line.quantity.normalize()}:{line.unit_price.normalize()}')
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()[:12]
+
+
+def _decimal_str(value):
+    return format(value.normalize(), 'f')
+
+
+def get_price_matrix(recipe, vector=None):
+    """Price of every ingredient line for every servings value of a recipe.
+
+    ``prices[i][j]`` is the price of line ``ids[j]`` for
+    ``min_servings + i`` servings, as an exact decimal string computed like
+    ``RecipeIngredient.get_price_for_servings``. The ``version`` must be
+    sent back with add-to-cart so stale quotes can be rejected.
+    """
+    vector = vector or PriceVector.for_recipe(recipe)
+    version = price_version(vector)
+    min_servings = recipe.min_servings or 1
+    max_servings = max(recipe.max_servings, min_servings)
+
+    def build():
+        return {
+            'version': version,
+            'min_servings': min_servings,
+            'max_servings': max_servings,
+            'ids': [line.id for line in vector.lines],
+            'ingredient_ids': [line.ingredient_id for line in vector.lines],
+            'prices': [
+                [_decimal_str(vector.line_price(line, servings)) for line in vector.lines]
+                for servings in range(min_servings, max_servings + 1)
+            ],
+        }
+
+    return price_matrix_cache.get_or_set((recipe.pk, version, min_servings, max_servings), build)
+
+
+def get_total_costs(recipes, servings=None):
+    """Ingredient totals for many recipes with a single aggregate query.
+
+    ``servings`` is either one value applied to every recipe, a mapping of
+    recipe id to servings, or ``None`` for each recipe's default servings.
+    """
+    recipes = list(recipes)
+    rows = (
+        RecipeIngredient.objects
+        .filter(recipe_id__in=[recipe.pk for recipe in recipes])
+        .order_by()
+        .values('recipe_id')
+        .annotate(cost=Sum(LINE_COST))
+    )
+    costs = {row['recipe_id']: row['cost'] for row in rows}
+
+    totals = {}
+    for recipe in recipes:
+        if servings is None:
+            recipe_servings = recipe.default_servings or 1
+        elif isinstance(servings, dict):
+            recipe_servings = servings.get(recipe.pk, recipe.default_servings or 1)
+        else:
+            recipe_servings = servings
+        cost = costs.get(recipe.pk) or Decimal('0.00')
+        totals[recipe.pk] = cost * servings_multiplier(recipe_servings, recipe.default_servings)
+    return totals
+
+
+def get_total_cost(recipe, servings):
+    """Ingredient total for one recipe: free when ingredients are prefetched,
+    otherwise a single aggregate query."""
+    if 'ingredients' in getattr(recipe, '_prefetched_objects_cache', {}):
+        return PriceVector.for_recipe(recipe).total(servings)
+    return get_total_costs([recipe], servings)[recipe.pk]
+
+
+def in_pantry(user, on=None):
+    """Condition on ``RecipeIngredient`` rows: ``user`` has the ingredient, unexpired."""
+    return Exists(
+        PantryIngredient.objects
+        .filter(pantry__user=user, ingredient_id=OuterRef('ingredient_id'))
+        .unexpired(on)
+    )
+
+
+def pantry_line_ids(recipes, user):
+    """Ids of the lines of ``recipes`` covered by ``user``'s pantry, keyed by recipe id.
+
+    One query for any number of recipes; empty for anonymous users.
+    """
+    recipes = list(recipes)
+    owned = {recipe.pk: set() for recipe in recipes}
+    if not user.is_authenticated or not recipes:
+        return owned
+    rows = (
+        RecipeIngredient.objects
+        .filter(in_pantry(user), recipe_id__in=owned)
+        .values_list('recipe_id', 'id')
+    )
+    for recipe_id, line_id in rows:
+        owned[recipe_id].add(line_id)
+    return owned
+
+
+def pantry_quote(vector, servings, owned, excluded=()):
+    """``quote`` plus the price with the ``owned`` line ids left out as well.
+
+    ``pantry_price`` is what the customer pays once everything they have
+    at home is excluded on top of their own ``excluded`` choices.
+    """
+    prices = quote(vector, servings, excluded)
+    pantry_price = vector.total(servings, excluded=vector.resolve(excluded) | set(owned))
+    prices['pantry_price'] = max(pantry_price, Decimal('0.00'))
+    prices['pantry_savings'] = prices['base_price'] - prices['pantry_price']
+    return prices
+
+
+def get_pantry_costs(recipes, user, servings=None):
+    """Full and pantry-adjusted ingredient totals of many recipes: one aggregate.
+
+    ``servings`` works as in ``get_total_costs``. Returns, per recipe id,
+    ``base_price``, ``pantry_price`` and ``pantry_savings``.
+    """
+    recipes = list(recipes)
+    annotations = {'cost': Sum(LINE_COST)}
+    if user.is_authenticated:
+        annotations['owned_cost'] = Sum(LINE_COST, filter=Q(in_pantry(user)))
+    rows = (
+        RecipeIngredient.objects
+        .filter(recipe_id__in=[recipe.pk for recipe in recipes])
+        .order_by()
+        .values('recipe_id')
+        .annotate(**annotations)
+    )
+    costs = {row['recipe_id']: row for row in rows}
+
+    totals = {}
+    for recipe in recipes:
+        if servings is None:
+            recipe_servings = recipe.default_servings or 1
+        elif isinstance(servings, dict):
+            recipe_servings = servings.get(recipe.pk, recipe.default_servings or 1)
+        else:
+            recipe_servings = servings
+        multiplier = servings_multiplier(recipe_servings, recipe.default_servings)
+        row = costs.get(recipe.pk, {})
+        base_price = (row.get('cost') or Decimal('0.00')) * multiplier
+        savings = (row.get('owned_cost') or Decimal('0.00')) * multiplier
+        totals[recipe.pk] = {
+            'base_price': base_price,
+            'pantry_price': base_price - savings,
+            'pantry_savings': savings,
+        }
+    return totals
+
+
+def refresh_cost_per_serving(recipe_ids=None, batch_size=500):
+    """Recompute ``Recipe.cost_per_serving`` for ``recipe_ids`` (all recipes if None).
+
+    Each batch costs a select, one aggregate query and one bulk UPDATE;
+    returns the number of recipes refreshed.
+    """
+    recipes = Recipe.objects.order_by('pk').only('pk', 'default_servings', 'cost_per_serving')
+    if recipe_ids is not None:
+        recipe_ids = set(recipe_ids)
+        if not recipe_ids:
+            return 0
+        recipes = recipes.filter(pk__in=recipe_ids)
+
+    refreshed = 0
+    last_pk = 0
+    while True:
+        batch = list(recipes.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            if refreshed:
+                # Cost filters and their facet counts depend on the column
+                bump_catalog_version()
+            return refreshed
+        totals = get_total_costs(batch)
+        for recipe in batch:
+            per_serving = totals[recipe.pk] / Decimal(recipe.default_servings or 1)
+            recipe.cost_per_serving = per_serving.quantize(COST_PER_SERVING_QUANTUM)
+        Recipe.objects.bulk_update(batch, ['cost_per_serving'])
+        refreshed += len(batch)
+        last_pk = batch[-1].pk
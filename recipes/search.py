@@ -0,0 +1,229 @@
+"""Recipe full-text search.
+
+Search goes through a backend chosen with the ``RECIPE_SEARCH_BACKEND``
+setting. Backends index the name, description, instructions, ingredient
+names and dietary tags of published recipes and return matching recipe
+ids, best match first. ``SQLiteFTSBackend`` keeps an FTS5 table ranked
+with BM25; ``SimpleSearchBackend`` is an unindexed ``icontains`` fallback
+for databases without FTS5.
+"""
+import re
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .models import DietaryTag, Recipe, RecipeIngredient
+
+DEFAULT_SEARCH_BACKEND = 'recipes.search.SQLiteFTSBackend'
+
+# Most ids a search returns; pages past this are not worth ranking
+MAX_RESULTS = 1000
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+class BaseSearchBackend:
+    """Interface of a recipe search backend."""
+
+    def index(self, recipe_ids):
+        """(Re)index ``recipe_ids``, dropping any that are unpublished or gone."""
+        raise NotImplementedError
+
+    def remove(self, recipe_ids):
+        raise NotImplementedError
+
+    def rebuild(self, batch_size=500):
+        """Reindex every recipe; returns the number of recipes indexed."""
+        raise NotImplementedError
+
+    def search(self, query, limit=MAX_RESULTS):
+        """Ids of published recipes matching ``query``, best match first."""
+        raise NotImplementedError
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """Substring search straight on the recipe tables, nothing to keep in sync."""
+
+    def index(self, recipe_ids):
+        pass
+
+    def remove(self, recipe_ids):
+        pass
+
+    def rebuild(self, batch_size=500):
+        return 0
+
+    @staticmethod
+    def token_condition(token):
+        """Recipes containing ``token`` in any of the fields the FTS backend indexes."""
+        # Tags are indexed by their labels ("Gluten Free"), not their stored names
+        tags = [name for name, label in DietaryTag.DIETARY_CHOICES if token in label.lower()]
+        return (
+            Q(name__icontains=token)
+            | Q(description__icontains=token)
+            | Q(instructions__icontains=token)
+            | Q(ingredients__ingredient__name__icontains=token)
+            | Q(dietary_tags__name__in=tags)
+        )
+
+    def search(self, query, limit=MAX_RESULTS):
+        # Every word must match, as with the FTS backend; newest recipes first
+        tokens = TOKEN_RE.findall(query.lower())
+        if not tokens:
+            return []
+        recipes = Recipe.objects.filter(is_published=True)
+        for token in tokens:
+            recipes = recipes.filter(pk__in=Recipe.objects.filter(self.token_condition(token)).values('pk'))
+        return list(recipes.order_by('-created_at', '-id').values_list('pk', flat=True)[:limit])
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """BM25 ranked search over an FTS5 table holding one row per published recipe.
+
+    The row id is the recipe id. Matches rank by ``bm25()`` with the columns
+    weighted as in ``WEIGHTS``, so a hit in the name beats one buried in the
+    instructions.
+    """
+
+    table = 'recipes_recipe_fts'
+    columns = ('name', 'description', 'instructions', 'ingredients', 'tags')
+    WEIGHTS = (10.0, 2.0, 1.0, 4.0, 3.0)
+
+    def documents(self, recipe_ids):
+        """Index rows for the published recipes among ``recipe_ids``: three queries."""
+        recipes = (
+            Recipe.objects
+            .filter(pk__in=recipe_ids, is_published=True)
+            .values_list('pk', 'name', 'description', 'instructions')
+        )
+        ingredients = defaultdict(list)
+        rows = (
+            RecipeIngredient.objects
+            .filter(recipe_id__in=recipe_ids, recipe__is_published=True)
+            .values_list('recipe_id', 'ingredient__name')
+        )
+        for recipe_id, name in rows:
+            ingredients[recipe_id].append(name)
+
+        labels = dict(DietaryTag.DIETARY_CHOICES)
+        tags = defaultdict(list)
+        rows = (
+            Recipe.dietary_tags.through.objects
+            .filter(recipe_id__in=recipe_ids, recipe__is_published=True)
+            .values_list('recipe_id', 'dietarytag__name')
+        )
+        for recipe_id, name in rows:
+            tags[recipe_id].append(labels.get(name, name))
+
+        return [
+            (pk, name, description, instructions, ' '.join(ingredients[pk]), ' '.join(tags[pk]))
+            for pk, name, description, instructions in recipes
+        ]
+
+    def index(self, recipe_ids):
+        recipe_ids = list(set(recipe_ids))
+        if not recipe_ids:
+            return
+        documents = self.documents(recipe_ids)
+        placeholders = ', '.join(['%s'] * (len(self.columns) + 1))
+        with connection.cursor() as cursor:
+            self._delete(cursor, recipe_ids)
+            cursor.executemany(
+                f"INSERT INTO {self.table} (rowid, {', '.join(self.columns)}) VALUES ({placeholders})",
+                documents,
+            )
+
+    def remove(self, recipe_ids):
+        recipe_ids = list(set(recipe_ids))
+        if recipe_ids:
+            with connection.cursor() as cursor:
+                self._delete(cursor, recipe_ids)
+
+    def _delete(self, cursor, recipe_ids):
+        # Stay well below SQLite's bound parameter limit
+        for start in range(0, len(recipe_ids), 500):
+            chunk = recipe_ids[start:start + 500]
+            cursor.execute(
+                f"DELETE FROM {self.table} WHERE rowid IN ({', '.join(['%s'] * len(chunk))})",
+                chunk,
+            )
+
+    def rebuild(self, batch_size=500):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+        recipes = Recipe.objects.filter(is_published=True).order_by('pk').values_list('pk', flat=True)
+        indexed = 0
+        last_pk = 0
+        while True:
+            batch = list(recipes.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                return indexed
+            self.index(batch)
+            indexed += len(batch)
+            last_pk = batch[-1]
+
+    @staticmethod
+    def match_expression(query):
+        """FTS5 query matching every word of ``query`` as a prefix.
+
+        Each word is quoted, so user input can never use FTS5 syntax.
+        """
+        return ' '.join(f'"{token}"*' for token in TOKEN_RE.findall(query.lower()))
+
+    def search(self, query, limit=MAX_RESULTS):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        rank = f"bm25({self.table}, {', '.join(str(weight) for weight in self.WEIGHTS)})"
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s ORDER BY {rank} LIMIT %s",
+                [expression, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    path = getattr(settings, 'RECIPE_SEARCH_BACKEND', DEFAULT_SEARCH_BACKEND)
+    return import_string(path)()
+
+
+class RankedResults:
+    """Ranked recipe ids that load their ``Recipe`` objects one page at a time.
+
+    Supports ``len()`` and slicing, which is all ``Paginator`` needs, so a
+    search page costs one query for the recipes shown, whatever the number
+    of matches.
+    """
+
+    def __init__(self, ids, queryset):
+        self.ids = ids
+        self.queryset = queryset
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __bool__(self):
+        return bool(self.ids)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        ids = self.ids[index]
+        recipes = self.queryset.in_bulk(ids)
+        return [recipes[pk] for pk in ids if pk in recipes]
+
+
+def search_recipes(query, queryset=None):
+    """Published recipes matching ``query`` in rank order, as ``RankedResults``."""
+    if queryset is None:
+        queryset = Recipe.objects.filter(is_published=True)
+    return RankedResults(get_search_backend().search(query), queryset)
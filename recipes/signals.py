@@ -0,0 +1,146 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from ingredients.models import Ingredient
+from .models import DietaryTag, Recipe, RecipeCategory, RecipeIngredient
+from .dietary import refresh_dietary_masks
+from .facets import bump_catalog_version
+from .fragments import bump_category_nav_version, delete_card
+from .matcher import pantry_matcher
+from .nutrition import INGREDIENT_FIELDS as NUTRITION_FIELDS, refresh_nutrition
+from .pricing import refresh_cost_per_serving
+from .search import get_search_backend
+from .suggest import CATEGORY, INGREDIENT, RECIPE, suggest_index
+
+# Recipe fields copied into the search index
+SEARCHED_FIELDS = ('name', 'description', 'instructions', 'is_published')
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created or instance.field_changed('name'):
+        suggest_index.ingredient_changed(instance)
+    if created:
+        return
+    # Only the recipes using this ingredient need refreshing
+    if instance.field_changed('base_price_per_unit'):
+        refresh_cost_per_serving(instance.recipe_uses.values_list('recipe_id', flat=True))
+    if any(instance.field_changed(name) for name in NUTRITION_FIELDS):
+        refresh_nutrition(instance.recipe_uses.values_list('recipe_id', flat=True))
+    if instance.field_changed('name'):
+        get_search_backend().index(instance.recipe_uses.values_list('recipe_id', flat=True))
+
+
+@receiver(post_delete, sender=Ingredient)
+def ingredient_deleted(sender, instance, **kwargs):
+    suggest_index.discard(INGREDIENT, instance.pk)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def recipe_ingredient_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    recipe_ids = set()
+    if created or instance.field_changed('quantity') or instance.field_changed('ingredient_id'):
+        recipe_ids.add(instance.recipe_id)
+    if not created and instance.field_changed('recipe_id'):
+        recipe_ids.update(filter(None, [instance.recipe_id, instance.loaded_value('recipe_id')]))
+    refresh_cost_per_serving(recipe_ids)
+    refresh_nutrition(recipe_ids)
+    # Quantity changes don't touch the index, anything else recorded above does
+    if created or instance.field_changed('ingredient_id') or instance.field_changed('recipe_id'):
+        get_search_backend().index(recipe_ids)
+    if recipe_ids or instance.field_changed('is_optional'):
+        pantry_matcher.invalidate()
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_deleted(sender, instance, **kwargs):
+    refresh_cost_per_serving([instance.recipe_id])
+    refresh_nutrition([instance.recipe_id])
+    get_search_backend().index([instance.recipe_id])
+    pantry_matcher.invalidate()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created or instance.field_changed('default_servings'):
+        refresh_cost_per_serving([instance.pk])
+        refresh_nutrition([instance.pk])
+    if not created and (instance.field_changed('is_published') or instance.field_changed('default_servings')):
+        pantry_matcher.invalidate()
+    if created or any(instance.field_changed(name) for name in SEARCHED_FIELDS):
+        get_search_backend().index([instance.pk])
+    if created or any(instance.field_changed(name) for name in ('name', 'slug', 'is_published')):
+        suggest_index.recipe_changed(instance)
+    bump_catalog_version()
+    if not created:
+        # The new updated_at already gives the card a new key; drop the old one
+        delete_card(instance.pk, instance.loaded_value('updated_at'), instance.loaded_value('calories_per_serving'))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    get_search_backend().remove([instance.pk])
+    suggest_index.discard(RECIPE, instance.pk)
+    bump_catalog_version()
+    delete_card(instance.pk, instance.updated_at, instance.calories_per_serving)
+
+
+@receiver(post_save, sender=RecipeCategory)
+def category_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        suggest_index.category_changed(instance)
+        bump_catalog_version()
+        bump_category_nav_version()
+
+
+@receiver(post_delete, sender=RecipeCategory)
+def category_deleted(sender, instance, **kwargs):
+    suggest_index.discard(CATEGORY, instance.pk)
+    bump_catalog_version()
+    bump_category_nav_version()
+
+
+@receiver(post_save, sender=DietaryTag)
+def dietary_tag_saved(sender, instance, created, raw=False, **kwargs):
+    # A renamed tag moves its recipes to another bit
+    if not raw and not created:
+        refresh_dietary_masks(instance.recipe_set.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=DietaryTag)
+def dietary_tag_deleting(sender, instance, **kwargs):
+    # The m2m rows go with the tag, without an m2m_changed signal
+    instance._tagged_recipe_ids = list(instance.recipe_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=DietaryTag)
+def dietary_tag_deleted(sender, instance, **kwargs):
+    recipe_ids = getattr(instance, '_tagged_recipe_ids', [])
+    refresh_dietary_masks(recipe_ids)
+    get_search_backend().index(recipe_ids)
+
+
+@receiver(m2m_changed, sender=Recipe.dietary_tags.through)
+def recipe_dietary_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_catalog_version()
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            refresh_dietary_masks([instance.pk])
+            get_search_backend().index([instance.pk])
+    elif action == 'pre_clear':
+        # The cleared recipes can't be looked up once the rows are gone
+        instance._search_cleared_ids = list(instance.recipe_set.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        recipe_ids = getattr(instance, '_search_cleared_ids', [])
+        refresh_dietary_masks(recipe_ids)
+        get_search_backend().index(recipe_ids)
+    elif action in ('post_add', 'post_remove'):
+        refresh_dietary_masks(pk_set)
+        get_search_backend().index(pk_set)
@@ -0,0 +1,193 @@
+"""In-process typeahead index.
+
+Every word of every published recipe, category and ingredient name is
+kept in one sorted list, so a prefix lookup is a ``bisect`` plus a short
+scan and never touches the database. The index is loaded on first use
+and updated in place by the model signals of this process. Those signals
+also bump a version in the shared cache, and the other processes reload
+once they notice it moved, checked at most every ``VERSION_CHECK_INTERVAL``
+seconds. A full reload every ``REFRESH_INTERVAL`` seconds catches writes
+that bypass the signals.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from blissbox.cache import CacheNamespace
+from ingredients.models import Ingredient
+from .models import Recipe, RecipeCategory
+
+RECIPE = 'recipe'
+CATEGORY = 'category'
+INGREDIENT = 'ingredient'
+
+# Order suggestion types are listed in when equally good
+KIND_ORDER = {RECIPE: 0, CATEGORY: 1, INGREDIENT: 2}
+
+REFRESH_INTERVAL = 60 * 10
+VERSION_CHECK_INTERVAL = 5
+
+# Candidate entries examined per lookup, bounds the cost of short prefixes
+SCAN_LIMIT = 200
+
+WORD_RE = re.compile(r'\w+')
+
+# Only the version is stored; the index itself stays in process memory
+suggest_cache = CacheNamespace('suggest')
+
+
+def words(text):
+    return WORD_RE.findall(text.lower())
+
+
+class SuggestIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = []  # sorted (word, kind, pk)
+        self._items = {}  # (kind, pk) -> (label, url)
+        self._loaded_at = None
+        self._checked_at = None
+        self._version = None
+
+    @property
+    def loaded(self):
+        return self._loaded_at is not None
+
+    def load(self):
+        """Read every suggestible name: one query per kind."""
+        # Read before the queries, so a change made meanwhile triggers another load
+        version = suggest_cache.version()
+        items = {}
+        for pk, name, slug in Recipe.objects.filter(is_published=True).values_list('pk', 'name', 'slug'):
+            items[RECIPE, pk] = (name, self.url('recipes:detail', slug, name))
+        for pk, name, slug in RecipeCategory.objects.values_list('pk', 'name', 'slug'):
+            items[CATEGORY, pk] = (name, self.url('recipes:category', slug, name))
+        for pk, name in Ingredient.objects.values_list('pk', 'name'):
+            items[INGREDIENT, pk] = (name, self.search_url(name))
+
+        entries = sorted(
+            (word, kind, pk)
+            for (kind, pk), (label, url) in items.items()
+            for word in set(words(label))
+        )
+        with self._lock:
+            self._items = items
+            self._entries = entries
+            self._loaded_at = self._checked_at = time.monotonic()
+            self._version = version
+
+    def ensure_loaded(self):
+        now = time.monotonic()
+        if self._loaded_at is None or now - self._loaded_at > REFRESH_INTERVAL:
+            self.load()
+        elif now - self._checked_at > VERSION_CHECK_INTERVAL:
+            self._checked_at = now
+            if suggest_cache.version() != self._version:
+                self.load()
+
+    @staticmethod
+    def search_url(name):
+        return f"{reverse('recipes:search')}?{urlencode({'q': name})}"
+
+    @classmethod
+    def url(cls, view_name, slug, name):
+        # Rows saved without a slug can still be found through search
+        if not slug:
+            return cls.search_url(name)
+        return reverse(view_name, kwargs={'slug': slug})
+
+    def put(self, kind, pk, label, url):
+        """Add or replace one suggestion."""
+        with self._lock:
+            self._discard(kind, pk)
+            self._items[kind, pk] = (label, url)
+            for word in set(words(label)):
+                insort(self._entries, (word, kind, pk))
+
+    def discard(self, kind, pk):
+        self._bump()
+        with self._lock:
+            self._discard(kind, pk)
+
+    def _discard(self, kind, pk):
+        item = self._items.pop((kind, pk), None)
+        if item is None:
+            return
+        for word in set(words(item[0])):
+            entry = (word, kind, pk)
+            i = bisect_left(self._entries, entry)
+            if i < len(self._entries) and self._entries[i] == entry:
+                del self._entries[i]
+
+    def suggest(self, query, limit=8):
+        """Up to ``limit`` suggestions whose words start with the words of ``query``.
+
+        The last query word may be partial; every other word has to appear
+        in the label as well. Labels starting with the query come first.
+        """
+        terms = words(query)
+        if not terms:
+            return []
+        prefix = terms[-1]
+        phrase = ' '.join(terms)
+        with self._lock:
+            entries = self._entries
+            candidates = {}
+            i = bisect_left(entries, (prefix,))
+            end = min(len(entries), i + SCAN_LIMIT)
+            while i < end and entries[i][0].startswith(prefix):
+                key = entries[i][1:]
+                if key not in candidates:
+                    candidates[key] = self._items[key]
+                i += 1
+
+        results = []
+        for (kind, pk), (label, url) in candidates.items():
+            label_words = words(label)
+            if not all(any(word.startswith(term) for word in label_words) for term in terms[:-1]):
+                continue
+            rank = (not ' '.join(label_words).startswith(phrase), KIND_ORDER[kind], len(label), label)
+            results.append((rank, {'type': kind, 'label': label, 'url': url}))
+        results.sort(key=lambda result: result[0])
+        return [suggestion for rank, suggestion in results[:limit]]
+
+    # Model sync, called from recipes.signals
+
+    def _bump(self):
+        """Make the other processes reload, without reloading this one."""
+        version = suggest_cache.bump()
+        # Unless another process changed something since our last load
+        if self._version is not None and version == self._version + 1:
+            self._version = version
+
+    def recipe_changed(self, recipe):
+        self._bump()
+        if not self.loaded:
+            return
+        if recipe.is_published:
+            self.put(RECIPE, recipe.pk, recipe.name, self.url('recipes:detail', recipe.slug, recipe.name))
+        else:
+            with self._lock:
+                self._discard(RECIPE, recipe.pk)
+
+    def category_changed(self, category):
+        self._bump()
+        if self.loaded:
+            self.put(CATEGORY, category.pk, category.name, self.url('recipes:category', category.slug, category.name))
+
+    def ingredient_changed(self, ingredient):
+        self._bump()
+        if self.loaded:
+            self.put(INGREDIENT, ingredient.pk, ingredient.name, self.search_url(ingredient.name))
+
+
+suggest_index = SuggestIndex()
+
+
+def suggest(query, limit=8):
+    suggest_index.ensure_loaded()
+    return suggest_index.suggest(query, limit)
@@ -0,0 +1,17 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from recipes.fragments import render_category_nav, render_recipe_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def recipe_cards(recipes):
+    """Cards of ``recipes``, from the fragment cache where possible."""
+    return mark_safe(''.join(render_recipe_cards(recipes)))
+
+
+@register.simple_tag
+def category_nav(current_category=None):
+    return mark_safe(render_category_nav(current_category))
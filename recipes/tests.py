@@ -1,3 +1,299 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from blissbox.testing import isolated_cache
+from ingredients.models import Ingredient
+from users.models import CustomUser, Pantry, PantryIngredient
+from .dietary import DIETARY_BITS, mask_of, matching
+from .models import DietaryTag, Recipe, RecipeIngredient
+from .matcher import PantryMatcher, match_pantry, pantry_matcher
+from .pagination import CursorPage, CursorPaginator
+from .search import get_search_backend, search_recipes
+from .views import NEWEST_FIRST
+
+SEARCH_BACKENDS = ('recipes.search.SQLiteFTSBackend', 'recipes.search.SimpleSearchBackend')
+
+
+@isolated_cache
+class DerivedColumnsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ingredient = Ingredient.objects.create(
+            name='Flour', base_price_per_unit=Decimal('2.00'), calories=Decimal('3.000')
+        )
+        cls.recipe = Recipe.objects.create(
+            name='Sponge',
+            description='Cake',
+            instructions='Bake',
+            base_price=Decimal('100.00'),
+            default_servings=2,
+            is_published=True,
+        )
+        RecipeIngredient.objects.create(recipe=cls.recipe, ingredient=cls.ingredient, quantity=Decimal('10'))
+
+    def test_saving_a_stale_recipe_keeps_refreshed_columns(self):
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        self.assertEqual(stale.cost_per_serving, Decimal('10'))
+
+        self.ingredient.base_price_per_unit = Decimal('4.00')
+        self.ingredient.calories = Decimal('5.000')
+        self.ingredient.save()
+        stale.name = 'Victoria sponge'
+        stale.save()
+
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        self.assertEqual(recipe.name, 'Victoria sponge')
+        self.assertEqual(recipe.cost_per_serving, Decimal('20'))
+        self.assertEqual(recipe.calories_per_serving, Decimal('25'))
+
+
+@isolated_cache
+class SearchBackendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        chocolate = Ingredient.objects.create(name='Dark Chocolate', base_price_per_unit=Decimal('1.00'))
+        vegan = DietaryTag.objects.create(name='vegan')
+        gluten_free = DietaryTag.objects.create(name='gluten_free')
+
+        def recipe(name, tags=(), ingredients=(), **fields):
+            recipe = Recipe.objects.create(
+                name=name,
+                description=fields.pop('description', 'A cake'),
+                instructions='Bake',
+                base_price=Decimal('100.00'),
+                **fields,
+            )
+            recipe.dietary_tags.add(*tags)
+            for ingredient in ingredients:
+                RecipeIngredient.objects.create(recipe=recipe, ingredient=ingredient, quantity=Decimal('1'))
+            return recipe
+
+        cls.truffle = recipe('Truffle Torte', tags=[vegan], ingredients=[chocolate], is_published=True)
+        cls.brownie = recipe('Chocolate Brownie', tags=[gluten_free], is_published=True)
+        cls.sponge = recipe('Lemon Sponge', tags=[vegan, gluten_free], description='Zesty', is_published=True)
+        cls.draft = recipe('Chocolate Draft', is_published=False)
+
+    def tearDown(self):
+        get_search_backend.cache_clear()
+
+    def search(self, backend, query):
+        get_search_backend.cache_clear()
+        with override_settings(RECIPE_SEARCH_BACKEND=backend):
+            if backend == SEARCH_BACKENDS[0]:
+                # The signals indexed through whichever backend is configured
+                get_search_backend().rebuild()
+            return {recipe.pk for recipe in search_recipes(query)}
+
+    def test_backends_agree(self):
+        expected = {
+            'chocolate': {self.truffle.pk, self.brownie.pk},
+            'vegan': {self.truffle.pk, self.sponge.pk},
+            'gluten free': {self.brownie.pk, self.sponge.pk},
+            'vegan zesty': {self.sponge.pk},
+            'nothing matches': set(),
+            '': set(),
+        }
+        for backend in SEARCH_BACKENDS:
+            for query, ids in expected.items():
+                with self.subTest(backend=backend, query=query):
+                    self.assertEqual(self.search(backend, query), ids)
+
+    def test_simple_backend_lists_newest_first(self):
+        with override_settings(RECIPE_SEARCH_BACKEND=SEARCH_BACKENDS[1]):
+            get_search_backend.cache_clear()
+            self.assertEqual(get_search_backend().search('chocolate'), [self.brownie.pk, self.truffle.pk])
+
+
+@isolated_cache
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(8):
+            Recipe.objects.create(
+                name=f'Cake {i}',
+                description='Cake',
+                instructions='Bake',
+                base_price=Decimal('100.00') + i // 3,
+                is_published=True,
+            )
+        # Every recipe created together, so only the id orders them
+        Recipe.objects.update(created_at=timezone.now())
+
+    def walk(self, ordering, per_page=3):
+        """Ids of every page forwards, then of every page walking back from the last one."""
+        paginator = CursorPaginator(Recipe.objects.all(), per_page, ordering)
+        forwards = []
+        page = paginator.page()
+        self.assertFalse(page.has_previous())
+        pages = [page]
+        while page.has_next():
+            page = paginator.page(page.next_cursor)
+            pages.append(page)
+        for page in pages:
+            forwards.extend(recipe.pk for recipe in page)
+
+        backwards = []
+        while True:
+            backwards[:0] = [recipe.pk for recipe in page]
+            if not page.has_previous():
+                break
+            page = paginator.page(page.previous_cursor)
+        return forwards, backwards
+
+    def test_pages_cover_every_row_once_in_both_directions(self):
+        for ordering in (NEWEST_FIRST, ('base_price', 'id'), ('-base_price', '-id')):
+            with self.subTest(ordering=ordering):
+                expected = list(Recipe.objects.order_by(*ordering).values_list('pk', flat=True))
+                forwards, backwards = self.walk(ordering)
+                self.assertEqual(forwards, expected)
+                self.assertEqual(backwards, expected)
+
+    def test_invalid_cursors_are_not_found(self):
+        url = reverse('recipes:products')
+        tampered = CursorPaginator(Recipe.objects.all(), 3, ('name', 'id')).encode(Recipe.objects.first(), 'n')
+        for cursor in ('not-a-cursor', 'W10', tampered):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, 404)
+
+    def test_nullable_sorts_fall_back_to_offset_pages(self):
+        response = self.client.get(reverse('recipes:products'), {'sort': 'cost_asc', 'cursor': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIsInstance(response.context['page_obj'], CursorPage)
+
+        response = self.client.get(reverse('recipes:products'), {'sort': 'newest', 'cursor': ''})
+        self.assertIsInstance(response.context['page_obj'], CursorPage)
+
+
+@isolated_cache
+class DietaryMaskTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vegan = DietaryTag.objects.create(name='vegan')
+        cls.gluten_free = DietaryTag.objects.create(name='gluten_free')
+        cls.nut_free = DietaryTag.objects.create(name='nut_free')
+        cls.cake, cls.tart, cls.pie = [
+            Recipe.objects.create(
+                name=name, description='Cake', instructions='Bake', base_price=Decimal('100.00'), is_published=True
+            )
+            for name in ('Cake', 'Tart', 'Pie')
+        ]
+
+    def mask(self, recipe):
+        return Recipe.objects.values_list('dietary_mask', flat=True).get(pk=recipe.pk)
+
+    def test_forward_add_remove_and_clear(self):
+        self.cake.dietary_tags.add(self.vegan, self.gluten_free)
+        self.assertEqual(self.mask(self.cake), DIETARY_BITS['vegan'] | DIETARY_BITS['gluten_free'])
+        self.cake.dietary_tags.remove(self.vegan)
+        self.assertEqual(self.mask(self.cake), DIETARY_BITS['gluten_free'])
+        self.cake.dietary_tags.clear()
+        self.assertEqual(self.mask(self.cake), 0)
+
+    def test_reverse_add_remove_and_clear(self):
+        self.vegan.recipe_set.add(self.cake, self.tart)
+        self.assertEqual(self.mask(self.cake), DIETARY_BITS['vegan'])
+        self.assertEqual(self.mask(self.tart), DIETARY_BITS['vegan'])
+        self.vegan.recipe_set.remove(self.cake)
+        self.assertEqual(self.mask(self.cake), 0)
+        self.vegan.recipe_set.clear()
+        self.assertEqual(self.mask(self.tart), 0)
+
+    def test_tag_rename_and_delete(self):
+        self.cake.dietary_tags.add(self.vegan, self.nut_free)
+        self.nut_free.name = 'dairy_free'
+        self.nut_free.save()
+        self.assertEqual(self.mask(self.cake), DIETARY_BITS['vegan'] | DIETARY_BITS['dairy_free'])
+        self.vegan.delete()
+        self.assertEqual(self.mask(self.cake), DIETARY_BITS['dairy_free'])
+
+    def test_matching_returns_supersets_only(self):
+        self.cake.dietary_tags.add(self.vegan, self.gluten_free)
+        self.tart.dietary_tags.add(self.vegan)
+        self.pie.dietary_tags.add(self.gluten_free, self.nut_free)
+        recipes = Recipe.objects.all()
+
+        self.assertEqual(set(matching(recipes, mask_of(['vegan']))), {self.cake, self.tart})
+        self.assertEqual(set(matching(recipes, mask_of(['vegan', 'gluten_free']))), {self.cake})
+        self.assertEqual(set(matching(recipes, mask_of(['vegan', 'nut_free']))), set())
+        self.assertEqual(set(matching(recipes, 0)), {self.cake, self.tart, self.pie})
+
+
+@isolated_cache
+class PantryMatcherTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.flour, cls.sugar, cls.eggs, cls.salt = [
+            Ingredient.objects.create(name=name, base_price_per_unit=Decimal('1.00'))
+            for name in ('Flour', 'Sugar', 'Eggs', 'Salt')
+        ]
+
+        def recipe(name, lines, optional=(), is_published=True):
+            recipe = Recipe.objects.create(
+                name=name,
+                description='Cake',
+                instructions='Bake',
+                base_price=Decimal('100.00'),
+                default_servings=2,
+                is_published=is_published,
+            )
+            for ingredient, quantity in lines:
+                RecipeIngredient.objects.create(recipe=recipe, ingredient=ingredient, quantity=Decimal(quantity))
+            for ingredient in optional:
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=ingredient, quantity=Decimal('1'), is_optional=True
+                )
+            return recipe
+
+        cls.shortbread = recipe('Shortbread', [(cls.flour, '100'), (cls.sugar, '50')], optional=[cls.salt])
+        cls.pancakes = recipe('Pancakes', [(cls.flour, '200'), (cls.eggs, '2')])
+        cls.draft = recipe('Draft', [(cls.flour, '1')], is_published=False)
+
+        cls.user = CustomUser.objects.create_user('baker', 'baker@example.com', 'secret-pass-123')
+        pantry = Pantry.objects.create(user=cls.user)
+        for ingredient, quantity, expires in (
+            (cls.flour, '100', None),
+            (cls.sugar, '500', date.today() - timedelta(days=1)),
+            (cls.eggs, '1', date.today() + timedelta(days=5)),
+        ):
+            PantryIngredient.objects.create(
+                pantry=pantry, ingredient=ingredient, quantity_available=Decimal(quantity), date_expires=expires
+            )
+
+    def setUp(self):
+        pantry_matcher.invalidate()
+
+    def test_coverage_and_missing_at_default_servings(self):
+        # Expired sugar doesn't count, nor do too few eggs or too little flour
+        (match,) = match_pantry(self.user)
+        self.assertEqual(match.recipe_id, self.shortbread.pk)
+        self.assertEqual((match.covered, match.required, match.coverage), (1, 2, 0.5))
+        self.assertEqual(match.missing, [self.sugar.pk])
+
+    def test_quantities_scale_with_servings(self):
+        matches = match_pantry(self.user, servings=1)
+        self.assertEqual([match.recipe_id for match in matches], [self.pancakes.pk, self.shortbread.pk])
+        self.assertEqual(matches[0].coverage, 1)
+        self.assertEqual(matches[0].missing, [])
+        self.assertEqual(match_pantry(self.user, servings=1, min_coverage=1), matches[:1])
+
+    def test_reloads_after_a_line_changes(self):
+        other_process = PantryMatcher()
+        other_process.load()
+        self.assertEqual(len(match_pantry(self.user)), 1)
+
+        line = RecipeIngredient.objects.get(recipe=self.pancakes, ingredient=self.flour)
+        line.quantity = Decimal('100')
+        line.save()
+        eggs = RecipeIngredient.objects.get(recipe=self.pancakes, ingredient=self.eggs)
+        eggs.quantity = Decimal('1')
+        eggs.save()
+
+        self.assertEqual(match_pantry(self.user)[0].recipe_id, self.pancakes.pk)
+        # Other processes notice the bumped version on their next check
+        contents = {self.flour.pk: Decimal('100'), self.eggs.pk: Decimal('1')}
+        other_process._checked_at -= 60
+        self.assertEqual(other_process.match(contents)[0].coverage, 1)
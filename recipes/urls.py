@@ -10,6 +10,8 @@ urlpatterns = [
     path('product/<slug:slug>/', views.ProductPageView.as_view(), name='product'),
     path('category/<slug:slug>/', views.CategoryRecipesView.as_view(), name='category'),
     path('search/', views.SearchRecipesView.as_view(), name='search'),
+    path('search/suggest/', views.SuggestView.as_view(), name='suggest'),
     path('subscribe/', views.SubscribeView.as_view(), name='subscribe'),
     path('calculate-price/', views.CalculatePriceView.as_view(), name='calculate-price'),
+    path('calculate-price/batch/', views.BatchQuoteView.as_view(), name='calculate-price-batch'),
 ]
@@ -2,11 +2,13 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.views.generic import ListView, DetailView, View
 from .models import Recipe, RecipeCategory
 from .forms import SubscriptionForm
+from .pricing import PriceVector, get_pantry_costs, get_price_matrix, pantry_line_ids, pantry_quote, quote
+from .search import search_recipes
+from .suggest import suggest
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 import json
-from decimal import Decimal
 from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib import messages
@@ -29,17 +31,27 @@ class SubscribeView(View):
 
 from django.views.generic import ListView, DetailView
 from .models import Recipe, RecipeCategory
-from django.db.models import Q, Count
-from datetime import date
+from django.db.models import F
+from .dietary import DietaryProfileMixin, matching
+from .facets import NUTRITION_RANGES, ProductFilters, get_facets
+from .pagination import CursorPaginationMixin
 
-class RecipeListView(ListView):
+# Newest first, with the id breaking ties between recipes created together
+NEWEST_FIRST = ('-created_at', '-id')
+
+
+class RecipeListView(DietaryProfileMixin, CursorPaginationMixin, ListView):
     model = Recipe
     template_name = 'recipes/recipe_list.html'
     context_object_name = 'recipes'
     paginate_by = 12
     
     def get_queryset(self):
-        return Recipe.objects.filter(is_published=True).prefetch_related('ingredients__ingredient')
+        qs = matching(Recipe.objects.filter(is_published=True), self.get_dietary_mask())
+        return qs.order_by(*NEWEST_FIRST)
+
+    def get_cursor_ordering(self):
+        return NEWEST_FIRST
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -51,11 +63,19 @@ class RecipeDetailView(DetailView):
     template_name = 'recipes/recipe_detail.html'
     context_object_name = 'recipe'
     slug_field = 'slug'
+
+    def get_queryset(self):
+        return Recipe.objects.prefetch_related('ingredients__ingredient', 'dietary_tags')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        recipe = self.get_object()
-        context['nutritional_info'] = recipe.get_nutritional_info()
+        recipe = self.object
+        # The template shows one serving
+        context['nutritional_info'] = recipe.get_nutritional_info(servings=1)
+        context['default_price'] = recipe.get_total_cost_for_default_servings()
+        context['price_matrix'] = get_price_matrix(recipe)
+        # Lines the user already has at home start out excluded
+        context['pantry_line_ids'] = pantry_line_ids([recipe], self.request.user)[recipe.pk]
         return context
 
 
@@ -68,12 +88,15 @@ class ProductPageView(DetailView):
     context_object_name = 'recipe'
     slug_field = 'slug'
 
+    def get_queryset(self):
+        return Recipe.objects.prefetch_related('ingredients__ingredient')
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # add any extra context if needed in future
+        context['default_price'] = self.object.get_total_cost_for_default_servings()
         return context
 
-class CategoryRecipesView(ListView):
+class CategoryRecipesView(DietaryProfileMixin, CursorPaginationMixin, ListView):
     model = Recipe
     template_name = 'recipes/recipe_list.html'
     context_object_name = 'recipes'
@@ -81,7 +104,11 @@ class CategoryRecipesView(ListView):
 
     def get_queryset(self):
         self.category = get_object_or_404(RecipeCategory, slug=self.kwargs['slug'])
-        return Recipe.objects.filter(category=self.category, is_published=True).prefetch_related('ingredients__ingredient')
+        qs = Recipe.objects.filter(category=self.category, is_published=True)
+        return matching(qs, self.get_dietary_mask()).order_by(*NEWEST_FIRST)
+
+    def get_cursor_ordering(self):
+        return NEWEST_FIRST
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -89,7 +116,9 @@ class CategoryRecipesView(ListView):
         context['current_category'] = self.category
         return context
 
-class SearchRecipesView(ListView):
+class SearchRecipesView(CursorPaginationMixin, ListView):
+    # Results are paged over the in-memory ranked ids, so offset paging is
+    # already cheap here and there is no cursor ordering
     model = Recipe
     template_name = 'recipes/recipe_list.html'
     context_object_name = 'recipes'
@@ -98,10 +127,8 @@ class SearchRecipesView(ListView):
     def get_queryset(self):
         query = self.request.GET.get('q')
         if query:
-            return Recipe.objects.filter(
-                Q(name__icontains=query) | Q(description__icontains=query),
-                is_published=True
-            ).prefetch_related('ingredients__ingredient')
+            # Ranked ids come from the search index; only the page shown is loaded
+            return search_recipes(query)
         return Recipe.objects.none()
 
     def get_context_data(self, **kwargs):
@@ -111,6 +138,19 @@ class SearchRecipesView(ListView):
         return context
 
 
+class SuggestView(View):
+    """Typeahead suggestions for the search box, served from memory."""
+    max_limit = 10
+
+    def get(self, request, *args, **kwargs):
+        query = request.GET.get('q', '')[:100]
+        try:
+            limit = min(max(int(request.GET.get('limit', 8)), 1), self.max_limit)
+        except ValueError:
+            limit = 8
+        return JsonResponse({'query': query, 'suggestions': suggest(query, limit)})
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class CalculatePriceView(View):
     def post(self, request, *args, **kwargs):
@@ -119,40 +159,27 @@ class CalculatePriceView(View):
             recipe_slug = data.get('recipe_slug')
             servings = int(data.get('servings', 1))
             excluded_ingredients = data.get('excluded_ingredients', [])
+            use_pantry = bool(data.get('use_pantry'))
             
             # Get the recipe
             recipe = get_object_or_404(Recipe, slug=recipe_slug, is_published=True)
+            vector = PriceVector.for_recipe(recipe)
             
-            # Calculate base price as sum of ingredient costs for servings
-            base_price = recipe.get_total_cost_for_servings(servings)
-            
-            # Calculate savings from excluded ingredients
-            savings = Decimal('0.00')
-            if excluded_ingredients:
-                for ingredient_id in excluded_ingredients:
-                    # Accept either RecipeIngredient.id or Ingredient.id
-                    try:
-                        # First try Ingredient.id path
-                        recipe_ingredient = recipe.ingredients.get(ingredient_id=ingredient_id)
-                    except recipe.ingredients.model.DoesNotExist:
-                        try:
-                            # Fallback: RecipeIngredient.id
-                            recipe_ingredient = recipe.ingredients.get(id=ingredient_id)
-                        except recipe.ingredients.model.DoesNotExist:
-                            continue
-                    ingredient_price = recipe_ingredient.get_price_for_servings(servings)
-                    savings += ingredient_price
-            
-            # Calculate final price
-            final_price = base_price - savings
-            if final_price < Decimal('0.00'):
-                final_price = Decimal('0.00')
+            # Base price, savings from excluded ingredients (accepts either
+            # Ingredient.id or RecipeIngredient.id) and final price, plus
+            # the price with the user's pantry ingredients excluded too
+            extra = {}
+            if use_pantry:
+                owned = pantry_line_ids([recipe], request.user)[recipe.pk]
+                prices = pantry_quote(vector, servings, owned, excluded_ingredients)
+                extra['pantry_ingredients'] = sorted(owned)
+            else:
+                prices = quote(vector, servings, excluded_ingredients)
             
             return JsonResponse({
                 'success': True,
-                'base_price': float(base_price),
-                'savings': float(savings),
-                'final_price': float(final_price),
+                **{key: float(value) for key, value in prices.items()},
+                **extra,
                 'currency': '₹'
             })
             
@@ -161,77 +188,160 @@ class CalculatePriceView(View):
                 'success': False,
                 'error': str(e)
             }, status=400)
-class ProductListView(ListView):
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class BatchQuoteView(View):
+    """Price many ``{recipe_slug, servings, excluded_ingredients}`` items at once.
+
+    All recipes and their ingredients are loaded with two queries no matter
+    how many items are sent, so the detail page can fetch a whole servings
+    range in one round trip. With ``use_pantry`` each quote also carries the
+    pantry-adjusted price, for one more query in total. Items for unknown
+    recipes or servings outside the recipe's range fail on their own.
+    """
+    max_items = 200
+
+    def post(self, request, *args, **kwargs):
+        try:
+            data = json.loads(request.body)
+            items = data.get('items', []) if isinstance(data, dict) else data
+            if not isinstance(items, list):
+                raise ValueError('items must be a list')
+            if len(items) > self.max_items:
+                raise ValueError(f'At most {self.max_items} items per request')
+
+            slugs = {item.get('recipe_slug') for item in items}
+            recipes = {
+                recipe.slug: recipe
+                for recipe in Recipe.objects.filter(slug__in=slugs, is_published=True)
+            }
+            vectors = PriceVector.for_recipes(recipes.values())
+            use_pantry = isinstance(data, dict) and bool(data.get('use_pantry'))
+            owned = pantry_line_ids(recipes.values(), request.user) if use_pantry else {}
+
+            quotes = []
+            for item in items:
+                recipe_slug = item.get('recipe_slug')
+                recipe = recipes.get(recipe_slug)
+                if recipe is None:
+                    quotes.append({'recipe_slug': recipe_slug, 'success': False, 'error': 'Recipe not found'})
+                    continue
+                try:
+                    servings = int(item.get('servings', 1))
+                except (TypeError, ValueError):
+                    servings = None
+                if servings is None or not recipe.min_servings <= servings <= recipe.max_servings:
+                    quotes.append({
+                        'recipe_slug': recipe_slug,
+                        'success': False,
+                        'error': f'Servings must be between {recipe.min_servings} and {recipe.max_servings}',
+                    })
+                    continue
+                excluded = item.get('excluded_ingredients', [])
+                if use_pantry:
+                    prices = pantry_quote(vectors[recipe.pk], servings, owned[recipe.pk], excluded)
+                else:
+                    prices = quote(vectors[recipe.pk], servings, excluded)
+                quotes.append({
+                    'recipe_slug': recipe_slug,
+                    'success': True,
+                    'servings': servings,
+                    **{key: float(value) for key, value in prices.items()},
+                    **({'pantry_ingredients': sorted(owned[recipe.pk])} if use_pantry else {}),
+                })
+
+            return JsonResponse({
+                'success': True,
+                'quotes': quotes,
+                'currency': '₹'
+            })
+
+        except Exception as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=400)
+
+
+class ProductListView(DietaryProfileMixin, CursorPaginationMixin, ListView):
     model = Recipe
     template_name = 'recipes/product_list.html'
     context_object_name = 'products'
     paginate_by = 12
 
+    sorts = {
+        'newest': NEWEST_FIRST,
+        'price_asc': ('base_price', 'id'),
+        'price_desc': ('-base_price', '-id'),
+        'cost_asc': (F('cost_per_serving').asc(nulls_last=True), '-created_at', '-id'),
+        'cost_desc': (F('cost_per_serving').desc(nulls_last=True), '-created_at', '-id'),
+        'best_selling': ('-units_sold', '-id'),
+        'rating': NEWEST_FIRST,
+        'az': ('name', 'id'),
+        'za': ('-name', '-id'),
+    }
+
     def get_queryset(self):
-        qs = Recipe.objects.filter(is_published=True)
-
-        categories = self.request.GET.getlist('category') or self.request.GET.get('categories', '').split(',')
-        categories = [c for c in categories if c]
-        if categories:
-            qs = qs.filter(category__slug__in=categories)
-
-        min_price = self.request.GET.get('min_price')
-        max_price = self.request.GET.get('max_price')
-        if min_price:
-            try:
-                qs = qs.filter(base_price__gte=min_price)
-            except Exception:
-                pass
-        if max_price:
-            try:
-                qs = qs.filter(base_price__lte=max_price)
-            except Exception:
-                pass
-
-        brand = self.request.GET.get('brand')
-        if brand:
-            qs = qs.filter(created_by__username__iexact=brand)
-
-        available = self.request.GET.get('available')
-        if available == '1':
-            today = date.today()
-            qs = qs.filter(
-                Q(is_seasonal=False) |
-                Q(available_from__lte=today, available_until__gte=today)
-            )
+        self.filters = ProductFilters.from_query(self.request.GET, profile_mask=self.get_dietary_mask())
+        qs = self.filters.apply(Recipe.objects.filter(is_published=True))
 
         sort = self.request.GET.get('sort')
-        if sort == 'price_asc':
-            qs = qs.order_by('base_price')
-        elif sort == 'price_desc':
-            qs = qs.order_by('-base_price')
-        elif sort == 'newest':
-            qs = qs.order_by('-created_at')
-        elif sort == 'best_selling':
-            qs = qs.annotate(order_count=Count('orderitem')).order_by('-order_count', '-created_at')
-        elif sort == 'rating':
-            qs = qs.order_by('-created_at')
-        elif sort == 'az':
-            qs = qs.order_by('name')
-        elif sort == 'za':
-            qs = qs.order_by('-name')
-        else:
-            qs = qs.order_by('-created_at')
+        if sort not in self.sorts:
+            sort = 'newest'
+        if sort == 'best_selling':
+            # Every recipe has a sales rank row (see cart.sales), so this is
+            # an inner join walked in the rank table's units_sold index order
+            qs = qs.filter(sales_rank__isnull=False).annotate(units_sold=F('sales_rank__units_sold'))
+        self.sort = sort
+        qs = qs.order_by(*self.sorts[sort])
 
         return qs.select_related('category', 'created_by')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = RecipeCategory.objects.all()
-        context['brands'] = Recipe.objects.filter(created_by__isnull=False).values_list('created_by__username', flat=True).distinct()
+        facets = get_facets(self.filters)
+        context['facets'] = facets
+        context['categories'] = facets['categories']
+        context['brands'] = facets['brands']
         context['selected'] = {
-            'categories': self.request.GET.getlist('category') or self.request.GET.get('categories', '').split(','),
+            'categories': self.filters.categories,
             'min_price': self.request.GET.get('min_price', ''),
             'max_price': self.request.GET.get('max_price', ''),
+            'min_cost': self.request.GET.get('min_cost', ''),
+            'max_cost': self.request.GET.get('max_cost', ''),
             'brand': self.request.GET.get('brand', ''),
             'available': self.request.GET.get('available', ''),
             'sort': self.request.GET.get('sort', 'newest'),
         }
-        context['products_count'] = context['paginator'].count if context.get('paginator') else len(context['products'])
-        context['querystring'] = self.request.GET.urlencode()
+        context['nutrition_ranges'] = [
+            {
+                'name': name,
+                'label': label,
+                'unit': unit,
+                'min': self.request.GET.get(f'min_{name}', ''),
+                'max': self.request.GET.get(f'max_{name}', ''),
+            }
+            for name, (label, unit, column) in NUTRITION_RANGES.items()
+        ]
+        if not self.wants_count():
+            context['products_count'] = None
+        elif context.get('paginator'):
+            context['products_count'] = context['paginator'].count
+        else:
+            context['products_count'] = len(context['products'])
+        context['querystring'] = context['page_params']
+        if self.request.user.is_authenticated:
+            # What the page's recipes cost with the user's pantry left out: one query
+            products = list(context['products'])
+            pantry_costs = get_pantry_costs(products, self.request.user)
+            for product in products:
+                product.pantry_costs = pantry_costs[product.pk]
         return context
+
+    def get_cursor_ordering(self):
+        ordering = self.sorts[self.sort]
+        # Cost per serving can be null, which a cursor can't compare against
+        if all(isinstance(name, str) for name in ordering):
+            return ordering
+        return None
@@ -11,6 +11,22 @@ const BASE_PRICE = (() => {
   return isNaN(domVal) ? 0 : domVal;
 })();
 
+// Server computed line prices for every servings value (recipes.pricing.get_price_matrix)
+const PRICE_MATRIX = (() => {
+  const el = document.getElementById('price-matrix');
+  if (!el) return null;
+  try {
+    return JSON.parse(el.textContent);
+  } catch (e) {
+    return null;
+  }
+})();
+
+function matrixRow(servings) {
+    if (!PRICE_MATRIX) return null;
+    return PRICE_MATRIX.prices[servings - PRICE_MATRIX.min_servings] || null;
+}
+
 // Initialize price on page load
 document.addEventListener('DOMContentLoaded', function() {
     updatePrice();
@@ -49,41 +65,39 @@ function updatePrice() {
         servingsMultiplier = 1.0;
     }
     
-    // Calculate original price for servings
-    let originalPrice = BASE_PRICE * servingsMultiplier;
-    if (!Number.isFinite(originalPrice) || Number.isNaN(originalPrice)) {
-        originalPrice = BASE_PRICE;
-    }
-    const originalEl = document.getElementById('original-price');
-    if (originalEl) originalEl.textContent = originalPrice.toFixed(2);
-    
     // Calculate savings from excluded ingredients
     let excludedSavings = 0;
     let excludedIngredientIds = [];
     
     checkboxes.forEach(checkbox => {
-        // You'll need to pass ingredient prices from the server
-        // For now, we'll calculate on the server side
         excludedIngredientIds.push(checkbox.value);
     });
     
-    // Call server to calculate exact savings
-    if (excludedIngredientIds.length > 0) {
-        fetch(window.RECIPES_CALCULATE_PRICE_URL || '/calculate-price/', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'X-CSRFToken': document.querySelector('[name="csrfmiddlewaretoken"]').value
-            },
-            body: JSON.stringify({
-                recipe_slug: document.querySelector('[name="recipe"]')?.value,
-                servings: servings,
-                excluded_ingredients: excludedIngredientIds
-            })
-        })
-        .then(response => response.json())
-        .then(data => {
-            const savings = parseFloat(data?.savings);
+    // Calculate original price for servings
+    const row = matrixRow(servings);
+    let originalPrice = BASE_PRICE * servingsMultiplier;
+    if (row) {
+        // Price locally from the embedded matrix, no request needed
+        originalPrice = 0;
+        PRICE_MATRIX.ids.forEach((id, i) => {
+            const linePrice = parseFloat(row[i]);
+            originalPrice += linePrice;
+            if (excludedIngredientIds.includes(String(id))) excludedSavings += linePrice;
+        });
+    }
+    if (!Number.isFinite(originalPrice) || Number.isNaN(originalPrice)) {
+        originalPrice = BASE_PRICE;
+    }
+    const originalEl = document.getElementById('original-price');
+    if (originalEl) originalEl.textContent = originalPrice.toFixed(2);
+    
+    if (row) {
+        updatePriceDisplay(originalPrice, excludedSavings, servingsMultiplier);
+    } else if (excludedIngredientIds.length > 0) {
+        // Ask the server for exact savings (whole servings range at once, cached)
+        fetchSavingsRange(excludedIngredientIds)
+        .then(savingsByServings => {
+            const savings = parseFloat(savingsByServings?.[servings]);
             excludedSavings = Number.isNaN(savings) ? 0 : savings;
             updatePriceDisplay(originalPrice, excludedSavings, servingsMultiplier);
         })
@@ -111,6 +125,41 @@ function updatePrice() {
     document.getElementById('servings-field').value = servings;
 }
 
+// Savings per servings value, keyed by the sorted excluded ingredient ids
+const savingsCache = {};
+
+function fetchSavingsRange(excludedIngredientIds) {
+    const key = [...excludedIngredientIds].sort().join(',');
+    if (!savingsCache[key]) {
+        const recipeSlug = document.querySelector('[name="recipe"]')?.value;
+        const items = [];
+        for (let s = MIN_SERVINGS; s <= MAX_SERVINGS; s++) {
+            items.push({recipe_slug: recipeSlug, servings: s, excluded_ingredients: excludedIngredientIds});
+        }
+        savingsCache[key] = fetch(window.RECIPES_BATCH_QUOTE_URL || '/calculate-price/batch/', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': document.querySelector('[name="csrfmiddlewaretoken"]').value
+            },
+            body: JSON.stringify({items: items})
+        })
+        .then(response => response.json())
+        .then(data => {
+            const savingsByServings = {};
+            (data?.quotes || []).forEach(q => {
+                if (q.success) savingsByServings[q.servings] = q.savings;
+            });
+            return savingsByServings;
+        })
+        .catch(err => {
+            delete savingsCache[key];
+            throw err;
+        });
+    }
+    return savingsCache[key];
+}
+
 function updatePriceDisplay(originalPrice, savings, multiplier) {
     const base = Number.isFinite(originalPrice) ? originalPrice : 0;
     const save = Number.isFinite(savings) ? savings : 0;
@@ -155,7 +204,9 @@ function updateIngredientPrices(servings) {
         const unit = checkbox.dataset.unit || '';
         const multiplier = defaultServings > 0 ? (servings / defaultServings) : 1.0;
         const adjustedQty = qty * multiplier;
-        const adjustedPrice = ppu * adjustedQty;
+        const row = matrixRow(servings);
+        const idx = PRICE_MATRIX ? PRICE_MATRIX.ids.indexOf(parseInt(checkbox.value, 10)) : -1;
+        const adjustedPrice = (row && idx !== -1) ? parseFloat(row[idx]) : ppu * adjustedQty;
         if (qtyEl) qtyEl.textContent = `${adjustedQty.toFixed(2)} ${unit}`;
         if (priceEl) priceEl.textContent = `- ₹${adjustedPrice.toFixed(2)}`;
         checkbox.dataset.price = adjustedPrice.toFixed(2);
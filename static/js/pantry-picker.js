@@ -0,0 +1,140 @@
+// Ingredient picker of the pantry page, fed a page at a time by users:pantry-ingredients
+document.addEventListener('DOMContentLoaded', function() {
+    const picker = document.getElementById('pantry-picker');
+    if (!picker) {
+        return;
+    }
+    const input = picker.querySelector('input[type="search"]');
+    const results = picker.querySelector('.pantry-picker-results');
+    const more = picker.querySelector('.pantry-picker-more');
+    const rows = document.getElementById('pantry-rows');
+    const empty = document.getElementById('pantry-empty');
+
+    let timer = null;
+    let query = null;
+    let nextCursor = null;
+
+    function inList(id) {
+        return rows.querySelector('tr[data-ingredient="' + id + '"]') !== null;
+    }
+
+    function cell(child) {
+        const td = document.createElement('td');
+        if (typeof child === 'string') {
+            td.textContent = child;
+        } else {
+            td.appendChild(child);
+        }
+        return td;
+    }
+
+    function field(type, name, value) {
+        const el = document.createElement('input');
+        el.type = type;
+        el.name = name;
+        el.value = value;
+        if (type !== 'hidden') {
+            el.className = 'form-control form-control-sm';
+        }
+        return el;
+    }
+
+    function addRow(ingredient) {
+        if (inList(ingredient.id)) {
+            rows.querySelector('tr[data-ingredient="' + ingredient.id + '"] input[name="quantity"]').focus();
+            return;
+        }
+        const row = document.createElement('tr');
+        row.dataset.ingredient = ingredient.id;
+        const name = cell(ingredient.name);
+        name.appendChild(field('hidden', 'ingredient', ingredient.id));
+        row.appendChild(name);
+        const quantity = field('number', 'quantity', '1');
+        quantity.min = '0';
+        quantity.step = '0.001';
+        quantity.style.width = '110px';
+        row.appendChild(cell(quantity));
+        row.appendChild(cell(ingredient.unit));
+        row.appendChild(cell(field('date', 'date_expires', '')));
+        const discard = document.createElement('button');
+        discard.type = 'button';
+        discard.className = 'btn btn-sm btn-outline-danger';
+        discard.textContent = 'Discard';
+        discard.addEventListener('click', function() {
+            row.remove();
+            empty.hidden = rows.children.length > 0;
+        });
+        row.appendChild(cell(discard));
+        rows.appendChild(row);
+        empty.hidden = true;
+        quantity.focus();
+        quantity.select();
+    }
+
+    function render(data, append) {
+        if (!append) {
+            results.innerHTML = '';
+        }
+        data.results.forEach(ingredient => {
+            const item = document.createElement('li');
+            item.className = 'list-group-item d-flex justify-content-between align-items-center';
+            item.textContent = ingredient.name + ' (' + ingredient.unit + ')';
+            const add = document.createElement('button');
+            add.type = 'button';
+            add.className = 'btn btn-sm btn-outline-primary';
+            add.textContent = ingredient.in_pantry || inList(ingredient.id) ? 'In pantry' : 'Add';
+            add.addEventListener('click', function() {
+                addRow(ingredient);
+                add.textContent = 'In pantry';
+            });
+            item.appendChild(add);
+            results.appendChild(item);
+        });
+        nextCursor = data.next_cursor;
+        more.hidden = !nextCursor;
+    }
+
+    function load(append) {
+        const params = new URLSearchParams({q: query});
+        if (append && nextCursor) {
+            params.set('cursor', nextCursor);
+        }
+        const requested = query;
+        fetch(picker.dataset.searchUrl + '?' + params.toString())
+            .then(response => response.json())
+            .then(data => {
+                if (data.success && requested === query) {
+                    render(data, append);
+                }
+            })
+            .catch(() => {
+                more.hidden = true;
+            });
+    }
+
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        timer = setTimeout(function() {
+            const value = input.value.trim();
+            if (!value) {
+                query = null;
+                results.innerHTML = '';
+                more.hidden = true;
+                return;
+            }
+            query = value;
+            load(false);
+        }, 150);
+    });
+
+    input.addEventListener('keydown', function(e) {
+        // Enter would submit nothing useful here
+        if (e.key === 'Enter') {
+            e.preventDefault();
+        }
+    });
+
+    more.addEventListener('click', function() {
+        load(true);
+    });
+});
@@ -0,0 +1,82 @@
+// Typeahead for the header search box, fed by the recipes:suggest endpoint
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.querySelector('.search-form[data-suggest-url]');
+    if (!form) {
+        return;
+    }
+    const input = form.querySelector('input[name="q"]');
+    const list = document.createElement('ul');
+    list.className = 'search-suggestions';
+    list.hidden = true;
+    form.appendChild(list);
+
+    const cache = {};
+    let timer = null;
+    let active = -1;
+
+    function render(suggestions) {
+        list.innerHTML = '';
+        active = -1;
+        suggestions.forEach(suggestion => {
+            const item = document.createElement('li');
+            const link = document.createElement('a');
+            link.href = suggestion.url;
+            link.textContent = suggestion.label;
+            const kind = document.createElement('small');
+            kind.textContent = suggestion.type;
+            link.appendChild(kind);
+            item.appendChild(link);
+            list.appendChild(item);
+        });
+        list.hidden = suggestions.length === 0;
+    }
+
+    function lookup() {
+        const query = input.value.trim();
+        if (!query) {
+            render([]);
+            return;
+        }
+        if (cache[query]) {
+            render(cache[query]);
+            return;
+        }
+        fetch(form.dataset.suggestUrl + '?q=' + encodeURIComponent(query))
+            .then(response => response.json())
+            .then(data => {
+                cache[query] = data.suggestions;
+                if (input.value.trim() === query) {
+                    render(data.suggestions);
+                }
+            })
+            .catch(() => render([]));
+    }
+
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        timer = setTimeout(lookup, 120);
+    });
+
+    input.addEventListener('keydown', function(e) {
+        const links = list.querySelectorAll('a');
+        if (list.hidden || links.length === 0) {
+            return;
+        }
+        if (e.key === 'ArrowDown' || e.key === 'ArrowUp') {
+            e.preventDefault();
+            active = (active + (e.key === 'ArrowDown' ? 1 : -1) + links.length) % links.length;
+            links.forEach((link, i) => link.classList.toggle('active', i === active));
+        } else if (e.key === 'Enter' && active >= 0) {
+            e.preventDefault();
+            window.location = links[active].href;
+        } else if (e.key === 'Escape') {
+            list.hidden = true;
+        }
+    });
+
+    document.addEventListener('click', function(e) {
+        if (!form.contains(e.target)) {
+            list.hidden = true;
+        }
+    });
+});
@@ -0,0 +1,140 @@
+"""Dashboard counters.
+
+``get_dashboard_summary`` answers the dashboard's cart, pantry and order
+counters with one query of scalar subqueries, plus one for the latest
+orders when there are any, and returns them as a plain dict cached per
+user. Saves and deletes of cart items, pantry items and orders drop the
+user's summary through ``cart.signals`` and ``users.signals``. Bulk
+writers, which send no signals or would send one per row, run inside
+``invalidating_dashboards`` instead, which quiets the per-row handlers
+and drops each affected summary once.
+"""
+import threading
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from blissbox.cache import CacheNamespace
+from cart.models import Cart, CartItem, Order
+from .models import CustomUser, Pantry, PantryIngredient
+
+DASHBOARD_TIMEOUT = 60 * 15
+RECENT_ORDERS = 3
+EXPIRING_DAYS = 3
+OPEN_ORDER_STATUSES = ('pending', 'confirmed', 'processing', 'shipped')
+
+dashboard_cache = CacheNamespace('dashboard', timeout=DASHBOARD_TIMEOUT)
+
+_batches = threading.local()
+
+
+def _per_user(queryset, user_field, aggregate, output_field=None):
+    """Scalar subquery of ``aggregate`` over the rows of ``queryset`` owned by the outer user."""
+    output_field = output_field or IntegerField()
+    rows = (
+        queryset
+        .filter(**{user_field: OuterRef('pk')})
+        .order_by()
+        .values(user_field)
+        .annotate(value=aggregate)
+        .values('value')
+    )
+    return Coalesce(Subquery(rows, output_field=output_field), Value(0), output_field=output_field)
+
+
+def _counters(on):
+    money = DecimalField(max_digits=12, decimal_places=2)
+    cart_items = CartItem.objects.all()
+    pantry_items = PantryIngredient.objects.all()
+    orders = Order.objects.all()
+    return {
+        'cart_items': _per_user(cart_items, 'cart__user', Count('pk')),
+        'cart_quantity': _per_user(cart_items, 'cart__user', Sum('quantity')),
+        'cart_total': _per_user(
+            cart_items, 'cart__user', Sum(F('customized_price') * F('quantity'), output_field=money), money
+        ),
+        'pantry_items': _per_user(pantry_items, 'pantry__user', Count('pk')),
+        'pantry_expiring': _per_user(pantry_items.expiring_within(EXPIRING_DAYS, on), 'pantry__user', Count('pk')),
+        'pantry_expired': _per_user(pantry_items.expired(on), 'pantry__user', Count('pk')),
+        'order_count': _per_user(orders, 'user', Count('pk')),
+        'open_orders': _per_user(orders.filter(status__in=OPEN_ORDER_STATUSES), 'user', Count('pk')),
+    }
+
+
+def compute_dashboard_summary(user_id, on=None):
+    on = on or date.today()
+    counters = _counters(on)
+    summary = CustomUser.objects.filter(pk=user_id).annotate(**counters).values(*counters).get()
+    summary['cart_total'] = Decimal(summary['cart_total']).quantize(Decimal('0.01'))
+
+    summary['recent_orders'] = []
+    if summary['order_count']:
+        statuses = dict(Order.STATUS_CHOICES)
+        recent = (
+            Order.objects
+            .filter(user_id=user_id)
+            .order_by('-created_at')
+            .values('order_number', 'status', 'total', 'created_at')[:RECENT_ORDERS]
+        )
+        summary['recent_orders'] = [
+            dict(order, status_display=statuses.get(order['status'], order['status']))
+            for order in recent
+        ]
+    return summary
+
+
+def get_dashboard_summary(user):
+    """Dashboard counters and latest orders of ``user``, cached until they change.
+
+    Keys carry the date, since which pantry items count as expiring moves
+    with it.
+    """
+    today = date.today()
+    return dashboard_cache.get_or_set(
+        (user.pk, today),
+        lambda: compute_dashboard_summary(user.pk, today),
+    )
+
+
+def invalidate_dashboard(user_id):
+    if user_id is not None:
+        dashboard_cache.delete(user_id, date.today())
+
+
+@contextmanager
+def invalidating_dashboards(user_ids):
+    """Block of bulk writes touching only ``user_ids``' carts, pantries and orders.
+
+    The per-row signal handlers stand down inside it; the users' summaries
+    are dropped once on the way out.
+    """
+    _batches.depth = getattr(_batches, 'depth', 0) + 1
+    try:
+        yield
+    finally:
+        _batches.depth -= 1
+        for user_id in set(user_ids):
+            invalidate_dashboard(user_id)
+
+
+def in_dashboard_batch():
+    return getattr(_batches, 'depth', 0) > 0
+
+
+def _owner(instance, field_name, model):
+    """User id owning the cart or pantry ``instance`` points to, free when it is loaded."""
+    field = instance._meta.get_field(field_name)
+    if field.is_cached(instance):
+        return getattr(instance, field_name).user_id
+    return model.objects.filter(pk=getattr(instance, field.attname)).values_list('user_id', flat=True).first()
+
+
+def cart_owner(item):
+    return _owner(item, 'cart', Cart)
+
+
+def pantry_owner(item):
+    return _owner(item, 'pantry', Pantry)
@@ -0,0 +1,43 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+from users.models import PantryIngredient
+from users.pantry import send_expiry_digests, sweep_expired
+
+
+class Command(BaseCommand):
+    help = "Delete expired pantry items and optionally email expiring soon digests; run daily."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=0,
+            help="Keep items for this many days after they expire.",
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Only report how many items would be deleted.",
+        )
+        parser.add_argument(
+            '--digest',
+            action='store_true',
+            help="Also email users the items expiring within --days days.",
+        )
+        parser.add_argument('--days', type=int, default=3)
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            cutoff = date.today() - timedelta(days=options['grace'])
+            count = PantryIngredient.objects.expired(cutoff).count()
+            self.stdout.write(f"{count} expired pantry items would be deleted.")
+        else:
+            count = sweep_expired(grace_days=options['grace'], batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"Deleted {count} expired pantry items."))
+
+        if options['digest'] and not options['dry_run']:
+            sent = send_expiry_digests(days=options['days'])
+            self.stdout.write(self.style.SUCCESS(f"Sent {sent} expiring soon digests."))
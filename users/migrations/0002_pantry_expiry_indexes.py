@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ingredients", "0001_initial"),
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="pantryingredient",
+            index=models.Index(fields=["date_expires"], name="pantry_item_expires_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="pantryingredient",
+            index=models.Index(
+                fields=["pantry", "date_expires"], name="pantry_item_pantry_expires_idx"
+            ),
+        ),
+    ]
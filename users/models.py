@@ -1,4 +1,7 @@
+from datetime import date, timedelta
+
 from django.db import models
+from django.db.models import ExpressionWrapper, Q
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator
 from ingredients.models import Ingredient
@@ -61,6 +64,34 @@ class Pantry(models.Model):
         return self.ingredients.count()
 
 
+def expired_q(on=None):
+    """Pantry items expired ``on`` (today); those without an expiry date never expire."""
+    return Q(date_expires__isnull=False, date_expires__lt=on or date.today())
+
+
+class PantryIngredientQuerySet(models.QuerySet):
+    """Expiry lookups on ``date_expires``, served by its indexes.
+
+    Everything here, the pantry page, the sweeper and the matcher build on
+    ``expired_q``, so they all agree on what has expired.
+    """
+
+    def expired(self, on=None):
+        return self.filter(expired_q(on))
+
+    def unexpired(self, on=None):
+        return self.exclude(expired_q(on))
+
+    def with_expiry(self, on=None):
+        """Annotate each item with whether it has ``expired``."""
+        return self.annotate(expired=ExpressionWrapper(expired_q(on), output_field=models.BooleanField()))
+
+    def expiring_within(self, days, on=None):
+        """Items still good ``on`` (today) that expire in the next ``days`` days."""
+        on = on or date.today()
+        return self.filter(date_expires__gte=on, date_expires__lte=on + timedelta(days=days))
+
+
 class PantryIngredient(models.Model):
     pantry = models.ForeignKey(
         Pantry,
@@ -81,17 +112,17 @@ class PantryIngredient(models.Model):
     
     date_added = models.DateTimeField(auto_now_add=True)
     date_expires = models.DateField(null=True, blank=True)
+
+    objects = PantryIngredientQuerySet.as_manager()
     
     class Meta:
         unique_together = ('pantry', 'ingredient')
         verbose_name_plural = 'Pantry Ingredients'
+        indexes = [
+            # The sweeper and the expiring soon digest range over every pantry
+            models.Index(fields=['date_expires'], name='pantry_item_expires_idx'),
+            models.Index(fields=['pantry', 'date_expires'], name='pantry_item_pantry_expires_idx'),
+        ]
     
     def __str__(self):
         return f"{self.pantry.user.username} - {self.ingredient.name}"
-    
-    @property
-    def is_expired(self):
-        if self.date_expires:
-            from datetime import date
-            return date.today() > self.date_expires
-        return False
\ No newline at end of file
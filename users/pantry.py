@@ -0,0 +1,178 @@
+"""Bulk pantry edits and expiry housekeeping.
+
+``update_pantry`` applies any number of additions, quantity and expiry
+changes and removals to one pantry in a fixed number of queries, however
+many items the request carries.
+
+``sweep_expired`` and ``send_expiry_digests`` work across every pantry
+through the ``date_expires`` index; the ``sweep_pantry`` command runs them
+from cron.
+"""
+from collections import defaultdict, namedtuple
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.db import transaction
+from django.utils import timezone
+
+from ingredients.models import Ingredient
+from .dashboard import invalidating_dashboards
+from .models import Pantry, PantryIngredient
+
+QUANTITY_QUANTUM = Decimal('0.001')
+MAX_QUANTITY = Decimal('9999999.999')
+
+PantryChange = namedtuple('PantryChange', ['ingredient_id', 'quantity', 'date_expires'])
+
+
+def parse_changes(ingredients, quantities, expiries=()):
+    """``PantryChange``s from parallel lists of submitted values, plus errors.
+
+    A quantity of zero (or less) removes the item; a blank expiry date
+    means the item doesn't expire.
+    """
+    changes = {}
+    errors = []
+    expiries = list(expiries) + [''] * (len(ingredients) - len(expiries))
+    for ingredient_id, quantity, expires in zip(ingredients, quantities, expiries):
+        try:
+            ingredient_id = int(ingredient_id)
+        except (TypeError, ValueError):
+            errors.append(f'Invalid ingredient {ingredient_id!r}.')
+            continue
+        try:
+            quantity = Decimal(str(quantity).strip()).quantize(QUANTITY_QUANTUM)
+            if not quantity.is_finite() or quantity > MAX_QUANTITY:
+                raise InvalidOperation
+        except (TypeError, ValueError, InvalidOperation):
+            errors.append(f'Invalid quantity {quantity!r}.')
+            continue
+        try:
+            date_expires = date.fromisoformat(expires) if expires else None
+        except (TypeError, ValueError):
+            errors.append(f'Invalid expiry date {expires!r}.')
+            continue
+        # The last value sent for an ingredient wins
+        changes[ingredient_id] = PantryChange(ingredient_id, quantity, date_expires)
+    return list(changes.values()), errors
+
+
+def parse_removals(values):
+    """Ingredient ids from submitted ``remove`` values, plus errors."""
+    ids = []
+    errors = []
+    for value in values:
+        try:
+            ids.append(int(value))
+        except (TypeError, ValueError):
+            errors.append(f'Invalid ingredient {value!r}.')
+    return ids, errors
+
+
+def update_pantry(pantry, changes=(), remove=()):
+    """Apply ``changes`` and remove the ``remove`` ingredient ids from ``pantry``.
+
+    Costs a lookup of the ingredients and of the affected items, then at
+    most one insert, one update and one delete. Returns how many items
+    were added, updated and removed.
+    """
+    remove = {int(pk) for pk in remove}
+    changes = [change for change in changes if change.ingredient_id not in remove]
+    counts = {'added': 0, 'updated': 0, 'removed': 0}
+
+    with invalidating_dashboards([pantry.user_id]), transaction.atomic():
+        wanted = {change.ingredient_id for change in changes}
+        known = set(Ingredient.objects.filter(pk__in=wanted).values_list('pk', flat=True)) if wanted else set()
+        existing = {
+            item.ingredient_id: item
+            for item in pantry.ingredients.filter(ingredient_id__in=wanted)
+        } if wanted else {}
+
+        created = []
+        updated = []
+        for change in changes:
+            if change.ingredient_id not in known:
+                continue
+            if change.quantity <= 0:
+                remove.add(change.ingredient_id)
+                continue
+            item = existing.get(change.ingredient_id)
+            if item is None:
+                created.append(PantryIngredient(
+                    pantry=pantry,
+                    ingredient_id=change.ingredient_id,
+                    quantity_available=change.quantity,
+                    date_expires=change.date_expires,
+                ))
+            elif (item.quantity_available, item.date_expires) != (change.quantity, change.date_expires):
+                item.quantity_available = change.quantity
+                item.date_expires = change.date_expires
+                updated.append(item)
+
+        if remove:
+            counts['removed'], _ = pantry.ingredients.filter(ingredient_id__in=remove).delete()
+        if created:
+            PantryIngredient.objects.bulk_create(created)
+            counts['added'] = len(created)
+        if updated:
+            PantryIngredient.objects.bulk_update(updated, ['quantity_available', 'date_expires'])
+            counts['updated'] = len(updated)
+        if any(counts.values()):
+            pantry.save(update_fields=['last_updated'])
+    return counts
+
+
+def sweep_expired(on=None, grace_days=0, batch_size=1000):
+    """Delete pantry items that expired more than ``grace_days`` before ``on`` (today).
+
+    Works in batches read off the ``date_expires`` index, each costing a
+    select, one delete and one update of the affected pantries'
+    ``last_updated``; returns the number of items deleted.
+    """
+    cutoff = (on or date.today()) - timedelta(days=grace_days)
+    expired = PantryIngredient.objects.expired(cutoff).order_by()
+
+    deleted = 0
+    while True:
+        batch = list(expired.values_list('pk', 'pantry_id', 'pantry__user_id')[:batch_size])
+        if not batch:
+            return deleted
+        user_ids = {user_id for pk, pantry_id, user_id in batch}
+        with invalidating_dashboards(user_ids), transaction.atomic():
+            count, _ = PantryIngredient.objects.filter(pk__in=[pk for pk, pantry_id, user_id in batch]).delete()
+            Pantry.objects.filter(pk__in={pantry_id for pk, pantry_id, user_id in batch}).update(last_updated=timezone.now())
+        deleted += count
+
+
+def expiring_soon(days=3, on=None):
+    """Items expiring within ``days`` days of ``on`` (today), grouped by user: one query."""
+    items = (
+        PantryIngredient.objects
+        .expiring_within(days, on)
+        .select_related('pantry__user', 'ingredient')
+        .order_by('pantry__user_id', 'date_expires', 'ingredient__name')
+    )
+    digest = defaultdict(list)
+    for item in items:
+        digest[item.pantry.user].append(item)
+    return dict(digest)
+
+
+def send_expiry_digests(days=3, on=None):
+    """Email each user the pantry items about to expire; returns the number of emails sent."""
+    messages = []
+    for user, items in expiring_soon(days, on).items():
+        if not user.email:
+            continue
+        lines = [
+            f'- {item.ingredient.name}: {item.quantity_available.normalize()} '
+            f'{item.ingredient.get_default_unit_display()}, expires {item.date_expires:%d %b %Y}'
+            for item in items
+        ]
+        message = f'Hi {user.username},\n\nThese items in your pantry expire soon:\n\n' + '\n'.join(lines)
+        messages.append(('Pantry items expiring soon', message, settings.DEFAULT_FROM_EMAIL, [user.email]))
+    if not messages:
+        return 0
+    return send_mass_mail(messages, fail_silently=False)
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .dashboard import in_dashboard_batch, invalidate_dashboard, pantry_owner
+from .models import PantryIngredient
+
+
+@receiver(post_save, sender=PantryIngredient)
+@receiver(post_delete, sender=PantryIngredient)
+def pantry_item_changed(sender, instance, raw=False, **kwargs):
+    # Pantry counters on the user's dashboard; bulk writers batch this
+    if not raw and not in_dashboard_batch():
+        invalidate_dashboard(pantry_owner(instance))
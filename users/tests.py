@@ -1,3 +1,168 @@
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.messages import get_messages
 from django.test import TestCase
+from django.urls import reverse
+
+from blissbox.testing import isolated_cache
+from cart.models import Cart, CartItem
+from ingredients.models import Ingredient
+from recipes.models import Recipe, RecipeIngredient
+from .dashboard import get_dashboard_summary
+from .models import CustomUser, Pantry, PantryIngredient
+from .pantry import PantryChange, parse_changes, sweep_expired, update_pantry
+
+
+@isolated_cache
+class DashboardInvalidationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('baker', 'baker@example.com', 'secret-pass-123')
+        cls.pantry = Pantry.objects.create(user=cls.user)
+        cls.cart = Cart.objects.create(user=cls.user)
+        cls.ingredient = Ingredient.objects.create(name='Flour', base_price_per_unit=Decimal('2.00'))
+        cls.recipe = Recipe.objects.create(
+            name='Sponge', description='Cake', instructions='Bake', base_price=Decimal('100.00'), is_published=True
+        )
+        RecipeIngredient.objects.create(recipe=cls.recipe, ingredient=cls.ingredient, quantity=Decimal('3'))
+
+    def add_pantry_item(self, expires=None):
+        return PantryIngredient.objects.create(
+            pantry=self.pantry, ingredient=self.ingredient, quantity_available=Decimal('1'), date_expires=expires
+        )
+
+    def test_pantry_item_save_and_delete(self):
+        self.assertEqual(get_dashboard_summary(self.user)['pantry_items'], 0)
+        item = PantryIngredient.objects.get(pk=self.add_pantry_item().pk)
+        self.assertEqual(get_dashboard_summary(self.user)['pantry_items'], 1)
+        item.delete()
+        self.assertEqual(get_dashboard_summary(self.user)['pantry_items'], 0)
+
+    def test_sweep(self):
+        self.add_pantry_item(expires=date.today() - timedelta(days=1))
+        self.assertEqual(get_dashboard_summary(self.user)['pantry_expired'], 1)
+        self.assertEqual(sweep_expired(), 1)
+        self.assertEqual(get_dashboard_summary(self.user)['pantry_expired'], 0)
+
+    def test_cart_item_save_delete_and_reprice(self):
+        item = CartItem.objects.create(
+            cart=self.cart, recipe=self.recipe, servings=4, quantity=2,
+            original_price=Decimal('5.00'), customized_price=Decimal('5.00'),
+        )
+        self.assertEqual(get_dashboard_summary(self.user)['cart_total'], Decimal('10.00'))
+        CartItem.objects.all().reprice()
+        # 3 units of flour at 2.00 for 2 servings, doubled to 4, times 2 items
+        self.assertEqual(get_dashboard_summary(self.user)['cart_total'], Decimal('24.00'))
+        CartItem.objects.get(pk=item.pk).delete()
+        self.assertEqual(get_dashboard_summary(self.user)['cart_items'], 0)
+
+
+@isolated_cache
+class PantryExpiryTests(TestCase):
+    def test_filters_and_annotation_agree(self):
+        user = CustomUser.objects.create_user('baker', 'baker@example.com', 'secret-pass-123')
+        pantry = Pantry.objects.create(user=user)
+        today = date.today()
+        for name, expires in [('Flour', None), ('Sugar', today), ('Eggs', today - timedelta(days=1))]:
+            PantryIngredient.objects.create(
+                pantry=pantry,
+                ingredient=Ingredient.objects.create(name=name, base_price_per_unit=Decimal('1.00')),
+                quantity_available=Decimal('1'),
+                date_expires=expires,
+            )
+        items = PantryIngredient.objects.order_by('ingredient__name')
+        self.assertEqual(list(items.expired().values_list('ingredient__name', flat=True)), ['Eggs'])
+        self.assertEqual(list(items.unexpired().values_list('ingredient__name', flat=True)), ['Flour', 'Sugar'])
+        self.assertEqual(
+            list(items.with_expiry().values_list('ingredient__name', 'expired')),
+            [('Eggs', True), ('Flour', False), ('Sugar', False)],
+        )
+        tomorrow = today + timedelta(days=1)
+        self.assertEqual(items.expired(tomorrow).count(), 2)
+        self.assertEqual(items.with_expiry(tomorrow).filter(expired=True).count(), 2)
+
+
+@isolated_cache
+class PantryEditTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('baker', 'baker@example.com', 'secret-pass-123')
+        cls.pantry = Pantry.objects.create(user=cls.user)
+        cls.flour, cls.sugar, cls.eggs = [
+            Ingredient.objects.create(name=name, base_price_per_unit=Decimal('1.00'))
+            for name in ('Flour', 'Sugar', 'Eggs')
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_form_rejects_malformed_removals(self):
+        response = self.client.post(reverse('users:pantry'), {'remove': ['²', 'x']})
+        self.assertRedirects(response, reverse('users:pantry'))
+        errors = [str(message) for message in get_messages(response.wsgi_request)]
+        self.assertEqual(errors, ["Invalid ingredient '²'.", "Invalid ingredient 'x'."])
+
+    def add(self, ingredient, quantity, expires=None):
+        PantryIngredient.objects.create(
+            pantry=self.pantry, ingredient=ingredient, quantity_available=Decimal(quantity), date_expires=expires
+        )
+
+    def contents(self):
+        return dict(self.pantry.ingredients.values_list('ingredient_id', 'quantity_available'))
+
+    def test_update_pantry_adds_updates_and_removes_at_once(self):
+        self.add(self.flour, '100')
+        self.add(self.sugar, '50')
+        self.add(self.eggs, '6')
+        changes, errors = parse_changes(
+            [self.flour.pk, self.sugar.pk, 999999],
+            ['250', '0', '1'],
+        )
+        self.assertEqual(errors, [])
+        counts = update_pantry(self.pantry, changes + [PantryChange(self.eggs.pk, Decimal('6'), None)], remove=[])
+        # Zero quantity removes sugar, the unknown ingredient is skipped and
+        # the unchanged eggs are left alone
+        self.assertEqual(counts, {'added': 0, 'updated': 1, 'removed': 1})
+        self.assertEqual(self.contents(), {self.flour.pk: Decimal('250'), self.eggs.pk: Decimal('6')})
+
+        changes, errors = parse_changes([self.sugar.pk], ['2'], ['2030-01-31'])
+        counts = update_pantry(self.pantry, changes, remove=[self.eggs.pk, self.flour.pk])
+        self.assertEqual(counts, {'added': 1, 'updated': 0, 'removed': 2})
+        self.assertEqual(self.contents(), {self.sugar.pk: Decimal('2')})
+        self.assertEqual(self.pantry.ingredients.get().date_expires, date(2030, 1, 31))
+
+    def test_parse_changes_reports_bad_values(self):
+        changes, errors = parse_changes(['x', self.flour.pk, self.sugar.pk], ['1', 'lots', '1'], ['', '', '31/01/2030'])
+        self.assertEqual(changes, [])
+        self.assertEqual(len(errors), 3)
+
+    def test_form_post(self):
+        self.add(self.eggs, '6')
+        response = self.client.post(reverse('users:pantry'), {
+            'ingredient': [self.flour.pk, self.eggs.pk],
+            'quantity': ['500', '12'],
+            'date_expires': ['', '2030-01-31'],
+        })
+        self.assertRedirects(response, reverse('users:pantry'))
+        self.assertEqual(self.contents(), {self.flour.pk: Decimal('500'), self.eggs.pk: Decimal('12')})
+
+        self.client.post(reverse('users:pantry'), {'remove': [self.eggs.pk]})
+        self.assertEqual(self.contents(), {self.flour.pk: Decimal('500')})
+
+    def test_json_post(self):
+        self.add(self.eggs, '6')
+        payload = {
+            'items': [{'ingredient': self.flour.pk, 'quantity': '1.5'}, {'ingredient': 999999, 'quantity': '1'}],
+            'remove': [self.eggs.pk],
+        }
+        response = self.client.post(reverse('users:pantry'), json.dumps(payload), content_type='application/json')
+        self.assertEqual(response.json(), {'success': True, 'added': 1, 'updated': 0, 'removed': 1})
+        self.assertEqual(self.contents(), {self.flour.pk: Decimal('1.5')})
 
-# Create your tests here.
+        payload = {'items': [{'ingredient': self.flour.pk, 'quantity': 'lots'}], 'remove': ['²']}
+        response = self.client.post(reverse('users:pantry'), json.dumps(payload), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.json()['errors']), 2)
+        self.assertEqual(self.contents(), {self.flour.pk: Decimal('1.5')})
@@ -9,5 +9,7 @@ urlpatterns = [
     path('logout/', views.CustomLogoutView.as_view(), name='logout'),
     path('dashboard/', views.DashboardView.as_view(), name='dashboard'),
     path('pantry/', views.PantryView.as_view(), name='pantry'),
+    path('pantry/ingredients/', views.PantryIngredientSearchView.as_view(), name='pantry-ingredients'),
+    path('pantry/recipes/', views.PantryRecipesView.as_view(), name='pantry-recipes'),
     path('orders/', views.OrdersView.as_view(), name='orders'),
 ]
\ No newline at end of file
@@ -1,10 +1,20 @@
+import json
+
+from django.contrib import messages
+from django.http import JsonResponse
 from django.shortcuts import render, redirect
-from django.views.generic import CreateView, TemplateView
+from django.views.generic import CreateView, ListView, TemplateView, View
 from django.contrib.auth.views import LoginView, LogoutView
 from django.contrib.auth.mixins import LoginRequiredMixin
+from .dashboard import get_dashboard_summary
 from .forms import CustomUserCreationForm
-from .models import Pantry
+from .models import Pantry, PantryIngredient
+from .pantry import parse_changes, parse_removals, update_pantry
 from cart.models import Order
+from ingredients.models import Ingredient
+from recipes.matcher import match_pantry
+from recipes.models import Recipe
+from recipes.pagination import CursorPaginator, InvalidCursor
 
 class RegisterView(CreateView):
     form_class = CustomUserCreationForm
@@ -22,12 +32,149 @@ class CustomLogoutView(LogoutView):
 class DashboardView(LoginRequiredMixin, TemplateView):
     template_name = 'users/dashboard.html'
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['summary'] = get_dashboard_summary(self.request.user)
+        return context
+
 class PantryView(LoginRequiredMixin, TemplateView):
+    """The user's pantry items, edited in bulk.
+
+    A POST carries parallel ``ingredient``, ``quantity`` and ``date_expires``
+    values to add or update, and ``remove`` ingredient ids, either as a
+    form or as a JSON object with ``items`` and ``remove`` lists. Ingredients
+    are picked through ``PantryIngredientSearchView``, so the page never
+    lists the whole catalog.
+    """
     template_name = 'users/pantry.html'
 
+    def get_pantry(self):
+        pantry, created = Pantry.objects.get_or_create(user=self.request.user)
+        return pantry
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        pantry = self.get_pantry()
+        context['pantry'] = pantry
+        context['pantry_items'] = list(
+            pantry.ingredients
+            .select_related('ingredient')
+            .with_expiry()
+            .order_by('ingredient__name')
+        )
+        return context
+
+    def post(self, request, *args, **kwargs):
+        if request.content_type == 'application/json':
+            try:
+                data = json.loads(request.body)
+                items = data.get('items', [])
+                changes, errors = parse_changes(
+                    [item.get('ingredient') for item in items],
+                    [item.get('quantity') for item in items],
+                    [item.get('date_expires') or '' for item in items],
+                )
+                remove, remove_errors = parse_removals(data.get('remove', []))
+                errors += remove_errors
+            except (AttributeError, TypeError, ValueError) as e:
+                return JsonResponse({'success': False, 'error': str(e)}, status=400)
+            if errors:
+                return JsonResponse({'success': False, 'errors': errors}, status=400)
+            return JsonResponse({'success': True, **update_pantry(self.get_pantry(), changes, remove)})
+
+        changes, errors = parse_changes(
+            request.POST.getlist('ingredient'),
+            request.POST.getlist('quantity'),
+            request.POST.getlist('date_expires'),
+        )
+        remove, remove_errors = parse_removals(request.POST.getlist('remove'))
+        errors += remove_errors
+        if errors:
+            for error in errors:
+                messages.error(request, error)
+            return redirect('users:pantry')
+        counts = update_pantry(self.get_pantry(), changes, remove)
+        messages.success(request, 'Pantry updated: {added} added, {updated} updated, {removed} removed.'.format(**counts))
+        return redirect('users:pantry')
+
+class PantryIngredientSearchView(LoginRequiredMixin, View):
+    """Ingredients matching ``?q=`` for the pantry picker, a page at a time.
+
+    Pages are cursors over the name ordering; each result says whether the
+    user's pantry already has it.
+    """
+    per_page = 20
+
+    def get(self, request, *args, **kwargs):
+        query = request.GET.get('q', '').strip()
+        ingredients = Ingredient.objects.only('id', 'name', 'default_unit')
+        if query:
+            ingredients = ingredients.filter(name__icontains=query)
+        paginator = CursorPaginator(ingredients, self.per_page, ('name', 'id'))
+        try:
+            page = paginator.page(request.GET.get('cursor') or None)
+        except InvalidCursor:
+            return JsonResponse({'success': False, 'error': 'Invalid cursor'}, status=400)
+
+        owned = set(
+            PantryIngredient.objects
+            .filter(pantry__user=request.user, ingredient_id__in=[ingredient.id for ingredient in page])
+            .values_list('ingredient_id', flat=True)
+        )
+        return JsonResponse({
+            'success': True,
+            'results': [
+                {
+                    'id': ingredient.id,
+                    'name': ingredient.name,
+                    'unit': ingredient.get_default_unit_display(),
+                    'in_pantry': ingredient.id in owned,
+                }
+                for ingredient in page
+            ],
+            'next_cursor': page.next_cursor,
+        })
+
+class PantryRecipesView(LoginRequiredMixin, ListView):
+    """Recipes ranked by how much of them the user's pantry covers."""
+    template_name = 'users/pantry_recipes.html'
+    context_object_name = 'matches'
+    paginate_by = 12
+    max_servings = 50
+
+    def get_servings(self):
+        try:
+            servings = int(self.request.GET.get('servings', ''))
+        except ValueError:
+            return None
+        return min(max(servings, 1), self.max_servings)
+
+    def get_queryset(self):
+        self.servings = self.get_servings()
+        return match_pantry(self.request.user, servings=self.servings)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['pantry'] = Pantry.objects.get(user=self.request.user)
+        # Only the recipes and missing ingredients of the page shown are loaded
+        matches = context['matches']
+        recipes = Recipe.objects.in_bulk([match.recipe_id for match in matches])
+        names = dict(
+            Ingredient.objects
+            .filter(pk__in={pk for match in matches for pk in match.missing})
+            .values_list('pk', 'name')
+        )
+        context['results'] = [
+            {
+                'recipe': recipes[match.recipe_id],
+                'coverage': round(match.coverage * 100),
+                'covered': match.covered,
+                'required': match.required,
+                'missing': [names[pk] for pk in match.missing if pk in names],
+            }
+            for match in matches
+            if match.recipe_id in recipes
+        ]
+        context['servings'] = self.servings
         return context
 
 class OrdersView(LoginRequiredMixin, TemplateView):